@@ -0,0 +1,235 @@
+import os
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import argparse
+import json
+import math
+import platform
+import sys
+import time
+
+import numpy as np
+import pygame
+
+import main as starfield
+
+# Default benchmark matrix
+PARTICLE_COUNTS = [200, 1000, 5000, 20000, 50000, 100000]
+PARTICLE_SIZES = [1, 5, 10]
+ATTRACTOR_COUNTS = [1, 2, 4, 8, 16, 32]
+PHASES = ['update', 'draw', 'background', 'flip']
+# Renderer modes plus 'trails': batched stars drawn through the TrailRenderer accumulation surface, and
+# 'parallax': batched stars in front of the ParallaxLayers depth layers
+BENCHMARK_MODES = starfield.RENDER_MODES + ['trails', 'parallax']
+
+def percentiles(samples):
+    samples = np.asarray(samples) * 1000  # ms
+    return {
+        'p50': float(np.percentile(samples, 50)),
+        'p95': float(np.percentile(samples, 95)),
+        'p99': float(np.percentile(samples, 99)),
+        'mean': float(samples.mean())
+    }
+
+# Run one configuration through the same update/draw/blit/flip sequence as main()
+def run_case(num_particles, width, height, particle_size, render_mode, frames, warmup, seed, workers=0, chunk_size=8192):
+    # The particle size sets the smallest star; the spread matches the app's default (1, 3) at size 1
+    starfield.PARTICLE_SIZE = particle_size
+    size_range = (particle_size, particle_size + 2)
+    screen = pygame.display.set_mode((width, height))
+    background = starfield.BackgroundManager().get((width, height))
+    stars = starfield.StarField(num_particles, width, height, seed=seed, size_range=size_range)
+    simulation = stars
+    if workers > 1:
+        simulation = starfield.ParallelSimulation(stars, workers, chunk_size, seed)
+    sprites = starfield.SpriteCache()
+    sprites.configure(starfield.PARTICLE_SIZE, starfield.PULSE_AMPLITUDE)
+    renderer = starfield.StarRenderer(sprites, 'batched' if render_mode in ('trails', 'parallax') else render_mode)
+    trails = starfield.TrailRenderer() if render_mode == 'trails' else None
+    layers = None
+    if render_mode == 'parallax':
+        layers = starfield.ParallaxLayers(sprites, seed=seed)
+        layers.resize(num_particles, width, height)
+    sim_clock = starfield.SimClock(starfield.SIM_RATE)
+    frame_ms = 1000 / starfield.FPS
+
+    frame_times = []
+    phase_times = {phase: [] for phase in PHASES}
+    for frame in range(warmup + frames):
+        # Mouse circles the screen centre so both attraction and repulsion get exercised
+        angle = frame * 0.05
+        mouse_x = width / 2 + math.cos(angle) * width / 4
+        mouse_y = height / 2 + math.sin(angle) * height / 4
+
+        t0 = time.perf_counter()
+        screen.blit(background, (0, 0))
+        t1 = time.perf_counter()
+        attractors = starfield.pointer_attractors([(mouse_x, mouse_y)])
+        steps = sim_clock.advance(frame_ms)
+        for _ in range(steps):
+            simulation.update(attractors, width, height, sim_clock.step(), sim_clock.dt)
+        if layers:
+            layers.update(steps * sim_clock.dt, attractors, width, height, sim_clock.time_ms)
+        t2 = time.perf_counter()
+        if layers:
+            layers.draw(screen, (mouse_x, mouse_y), (width, height))
+        if trails:
+            trails.draw(screen, stars, renderer, sim_clock.blend, 1.0, starfield.TRAIL_DECAY, frame_ms)
+        else:
+            renderer.draw(screen, stars, sim_clock.blend)
+        t3 = time.perf_counter()
+        pygame.display.flip()
+        t4 = time.perf_counter()
+        pygame.event.pump()
+
+        if frame >= warmup:
+            frame_times.append(t4 - t0)
+            phase_times['background'].append(t1 - t0)
+            phase_times['update'].append(t2 - t1)
+            phase_times['draw'].append(t3 - t2)
+            phase_times['flip'].append(t4 - t3)
+
+    if simulation is not stars:
+        simulation.close()
+
+    return {
+        'particles': num_particles,
+        'resolution': f"{width}x{height}",
+        'particle_size': particle_size,
+        'size_range': list(size_range),
+        'render_mode': render_mode,
+        'trail_decay': starfield.TRAIL_DECAY if trails else None,
+        'layer_particles': len(layers) if layers else 0,
+        'workers': workers,
+        'frames': frames,
+        'frame_ms': percentiles(frame_times),
+        'phases_ms': {phase: percentiles(times) for phase, times in phase_times.items()},
+        'sprite_cache': sprites.stats()
+    }
+
+# Time StarField.update with and without star-to-star (flocking) interactions
+def run_interaction_case(num_particles, width, height, frames, warmup, seed):
+    stars = starfield.StarField(num_particles, width, height, seed=seed)
+    sim_clock = starfield.SimClock(starfield.SIM_RATE)
+    attractors = starfield.pointer_attractors([(width / 2, height / 2)])
+    timings = {}
+    for flocking in (False, True):
+        stars.flocking = flocking
+        samples = []
+        pairs = []
+        for frame in range(warmup + frames):
+            t0 = time.perf_counter()
+            stars.update(attractors, width, height, sim_clock.step(), sim_clock.dt)
+            if frame >= warmup:
+                samples.append(time.perf_counter() - t0)
+                pairs.append(stars.neighbor_pairs)
+        timings['flocking' if flocking else 'mouse_only'] = (samples, pairs)
+
+    flock_samples, pairs = timings['flocking']
+    return {
+        'particles': num_particles,
+        'resolution': f"{width}x{height}",
+        'repulsion_threshold': starfield.REPULSION_THRESHOLD,
+        'frames': frames,
+        'update_ms': percentiles(timings['mouse_only'][0]),
+        'flocking_update_ms': percentiles(flock_samples),
+        'flocking_us_per_particle': float(np.median(flock_samples) * 1e6 / num_particles),
+        'neighbor_pairs': float(np.mean(pairs))
+    }
+
+# Time StarField.update against K attractors (drifting scripted wells) for each K
+def run_attractor_case(num_particles, width, height, attractor_counts, frames, warmup, seed):
+    results = []
+    for count in attractor_counts:
+        stars = starfield.StarField(num_particles, width, height, seed=seed)
+        sim_clock = starfield.SimClock(starfield.SIM_RATE)
+        wells = starfield.AttractorSet([{'phase': i * 2 * math.pi / count, 'period_x': 20 + i, 'period_y': 15 + i}
+                                        for i in range(count)])
+        wells.wells_enabled = True
+        samples = []
+        for frame in range(warmup + frames):
+            time_ms = sim_clock.step()
+            # The pointer row is dropped so exactly `count` sources act on the field
+            sources = wells.sources((0, 0), width, height, time_ms)[1:]
+            t0 = time.perf_counter()
+            stars.update(sources, width, height, time_ms, sim_clock.dt)
+            if frame >= warmup:
+                samples.append(time.perf_counter() - t0)
+        results.append({
+            'particles': num_particles,
+            'resolution': f"{width}x{height}",
+            'attractors': count,
+            'frames': frames,
+            'update_ms': percentiles(samples),
+            'ns_per_star_attractor': float(np.median(samples) * 1e9 / (num_particles * count))
+        })
+    return results
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Headless Calming Starfield benchmark")
+    parser.add_argument('--suite', choices=['render', 'interactions', 'attractors'], default='render',
+                        help="render: full frame loop; interactions: StarField.update with flocking on/off; "
+                             "attractors: StarField.update against --attractors sources")
+    parser.add_argument('--frames', type=int, default=120, help="measured frames per case")
+    parser.add_argument('--warmup', type=int, default=10, help="unmeasured frames before each case")
+    parser.add_argument('--counts', type=int, nargs='+', default=PARTICLE_COUNTS)
+    parser.add_argument('--resolutions', nargs='+', default=starfield.resolutions)
+    parser.add_argument('--sizes', type=int, nargs='+', default=PARTICLE_SIZES)
+    parser.add_argument('--modes', nargs='+', default=['batched', 'trails'], choices=BENCHMARK_MODES)
+    parser.add_argument('--attractors', type=int, nargs='+', default=ATTRACTOR_COUNTS, help="attractor counts for the attractors suite")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=0, help="simulation worker processes for the render suite")
+    parser.add_argument('--chunk-size', type=int, default=8192)
+    parser.add_argument('--output', help="write JSON here instead of stdout")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    pygame.init()
+    results = []
+    for res in args.resolutions:
+        width, height = (int(v) for v in res.split('x'))
+        for num_particles in args.counts:
+            if args.suite == 'interactions':
+                result = run_interaction_case(num_particles, width, height, args.frames, args.warmup, args.seed)
+                results.append(result)
+                print(f"{result['resolution']} n={num_particles}: flocking p50 {result['flocking_update_ms']['p50']:.2f} ms "
+                      f"({result['flocking_us_per_particle']:.2f} us/particle, {result['neighbor_pairs']:.0f} pairs)", file=sys.stderr)
+                continue
+            if args.suite == 'attractors':
+                for result in run_attractor_case(num_particles, width, height, args.attractors, args.frames, args.warmup, args.seed):
+                    results.append(result)
+                    print(f"{result['resolution']} n={num_particles} k={result['attractors']}: p50 {result['update_ms']['p50']:.2f} ms "
+                          f"({result['ns_per_star_attractor']:.1f} ns per star and attractor)", file=sys.stderr)
+                continue
+            for particle_size in args.sizes:
+                for mode in args.modes:
+                    result = run_case(num_particles, width, height, particle_size, mode, args.frames, args.warmup, args.seed,
+                                      args.workers, args.chunk_size)
+                    results.append(result)
+                    print(f"{result['resolution']} n={num_particles} size={particle_size} {mode}: "
+                          f"p50 {result['frame_ms']['p50']:.2f} ms, p99 {result['frame_ms']['p99']:.2f} ms", file=sys.stderr)
+    pygame.quit()
+
+    report = {
+        'meta': {
+            'python': platform.python_version(),
+            'pygame': pygame.version.ver,
+            'numpy': np.__version__,
+            'video_driver': os.environ.get('SDL_VIDEODRIVER'),
+            'suite': args.suite,
+            'frames': args.frames,
+            'warmup': args.warmup,
+            'seed': args.seed
+        },
+        'results': results
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+if __name__ == "__main__":
+    main()
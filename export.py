@@ -0,0 +1,132 @@
+import os
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')  # keep stdout clean for --raw
+
+import argparse
+import multiprocessing
+import sys
+import time
+from collections import deque
+
+import pygame
+
+import main as starfield
+
+# Runs in an encoder process: rebuild the frame from its raw RGB bytes and let pygame compress it
+def encode_png(path, size, data):
+    pygame.image.save(pygame.image.frombytes(data, size, 'RGB'), path)
+    return path
+
+# Render frames at a fixed timestep, independent of real time, and hand each one to the writer
+def export(args):
+    width, height = (int(v) for v in args.resolution.split('x'))
+    starfield.load_config()
+    if args.particles is not None:
+        starfield.NUM_PARTICLES = args.particles
+    if args.particle_size is not None:
+        starfield.PARTICLE_SIZE = args.particle_size
+
+    pygame.init()
+    screen = pygame.display.set_mode((width, height))
+    background = starfield.BackgroundManager().get((width, height))
+    stars = starfield.StarField(starfield.NUM_PARTICLES, width, height, seed=args.seed)
+    simulation = stars
+    if args.workers > 1:
+        simulation = starfield.ParallelSimulation(stars, args.workers, args.chunk_size, args.seed)
+    sprites = starfield.SpriteCache()
+    sprites.configure(starfield.PARTICLE_SIZE, starfield.PULSE_AMPLITUDE)
+    renderer = starfield.StarRenderer(sprites)
+    # Offline there is no frame budget, so every simulation step is run
+    sim_clock = starfield.SimClock(starfield.SIM_RATE, max_steps=sys.maxsize)
+    frame_ms = 1000 / args.fps
+    pointer = tuple(args.attractor) if args.attractor else (width / 2, height / 2)
+    attractors = starfield.AttractorSet(starfield.GRAVITY_WELLS)
+    attractors.wells_enabled = args.wells
+
+    pool = None
+    if not args.raw:
+        os.makedirs(args.output, exist_ok=True)
+        if args.encoders > 0:
+            pool = multiprocessing.get_context('spawn').Pool(args.encoders)
+    out = sys.stdout.buffer
+    pending = deque()
+    render_time = wait_time = 0.0
+
+    start = time.perf_counter()
+    for frame in range(args.frames):
+        t0 = time.perf_counter()
+        for _ in range(sim_clock.advance(frame_ms)):
+            time_ms = sim_clock.step()
+            simulation.update(attractors.sources(pointer, width, height, time_ms), width, height, time_ms, sim_clock.dt)
+        screen.blit(background, (0, 0))
+        renderer.draw(screen, stars, sim_clock.blend)
+        data = pygame.image.tobytes(screen, 'RGB')
+        t1 = time.perf_counter()
+        render_time += t1 - t0
+
+        if args.raw:
+            out.write(data)
+        else:
+            path = os.path.join(args.output, f"frame_{frame:05d}.png")
+            if pool is None:
+                encode_png(path, (width, height), data)
+            else:
+                # Bounded queue: wait for the oldest frame before handing out another, so memory stays flat
+                if len(pending) >= args.queue:
+                    pending.popleft().get()
+                pending.append(pool.apply_async(encode_png, (path, (width, height), data)))
+        wait_time += time.perf_counter() - t1
+
+        if args.progress and (frame + 1) % args.progress == 0:
+            elapsed = time.perf_counter() - start
+            print(f"{frame + 1}/{args.frames} frames, {(frame + 1) / elapsed:.1f} fps", file=sys.stderr)
+
+    t1 = time.perf_counter()
+    while pending:
+        pending.popleft().get()
+    if pool is not None:
+        pool.close()
+        pool.join()
+    if args.raw:
+        out.flush()
+    wait_time += time.perf_counter() - t1
+    elapsed = time.perf_counter() - start
+
+    if simulation is not stars:
+        simulation.close()
+    pygame.quit()
+    print(f"Exported {args.frames} frames at {width}x{height} in {elapsed:.2f}s: {args.frames / elapsed:.1f} fps "
+          f"(render {render_time * 1000 / max(1, args.frames):.2f} ms/frame, "
+          f"output {wait_time * 1000 / max(1, args.frames):.2f} ms/frame)", file=sys.stderr)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Export Calming Starfield frames offline")
+    parser.add_argument('--frames', type=int, default=600, help="number of frames to export")
+    parser.add_argument('--fps', type=float, default=60, help="output frame rate; the simulation advances 1/fps per frame")
+    parser.add_argument('--resolution', default='1920x1080')
+    parser.add_argument('--output', default='frames', help="directory for the PNG sequence (frame_00000.png, ...)")
+    parser.add_argument('--raw', action='store_true', help="write raw RGB24 frames to stdout instead of PNG files")
+    parser.add_argument('--encoders', type=int, default=os.cpu_count() or 1,
+                        help="PNG encoder processes (0 = encode in the render loop)")
+    parser.add_argument('--queue', type=int, help="frames in flight to the encoders (default 2 per encoder)")
+    parser.add_argument('--particles', type=int, help="star count (default from config.json)")
+    parser.add_argument('--particle-size', type=int, help="particle size (default from config.json)")
+    parser.add_argument('--attractor', type=float, nargs=2, metavar=('X', 'Y'),
+                        help="point the stars are drawn to, in place of the mouse (default screen centre)")
+    parser.add_argument('--wells', action='store_true', help="add the drifting gravity wells from config.json")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=0, help="simulation worker processes")
+    parser.add_argument('--chunk-size', type=int, default=8192)
+    parser.add_argument('--progress', type=int, default=100, help="report throughput every N frames (0 = off)")
+    args = parser.parse_args(argv)
+    if args.queue is None:
+        args.queue = 2 * max(1, args.encoders)
+    elif args.queue < 1:
+        parser.error("--queue must be at least 1")
+    return args
+
+def main(argv=None):
+    export(parse_args(argv))
+
+if __name__ == "__main__":
+    main()
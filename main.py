@@ -1,8 +1,23 @@
+import time
+STARTUP_START = time.perf_counter()  # --startup-profile counts module imports too
 import pygame
-import random
 import sys
 import math
 import json
+import argparse
+import csv
+import hashlib
+import struct
+import zlib
+import os
+import queue
+import threading
+import socketserver
+from http.server import HTTPServer, BaseHTTPRequestHandler
+import multiprocessing
+from multiprocessing import shared_memory
+from collections import OrderedDict
+import numpy as np
 
 # Constants (will be updated from config)
 WIDTH = 800
@@ -16,9 +31,41 @@ NUM_PARTICLES = 200
 PARTICLE_SIZE = 1
 PULSE_AMPLITUDE = 1.0
 PULSE_SPEED = 0.05
+SIM_RATE = 60  # simulation steps per second, independent of FPS
+MAX_SIM_STEPS = 5  # steps run per frame before the rest are dropped
+DIRTY_RECTS = False  # redraw only the screen areas stars touched instead of flipping the whole frame
+RENDER_SCALE = 1.0  # fraction of the window resolution the starfield is rasterized at before scaling up
+RENDER_SCALE_SMOOTH = False  # upscale with smoothscale instead of nearest-neighbour (much slower)
+TRAILS = False  # motion trails (toggled with T)
+TRAIL_DECAY = 0.1  # fraction of trail brightness lost per 1/60 s
+PARALLAX = False  # depth layers behind the main field (toggled with L)
+
+# Power saving: after IDLE_TIMEOUT seconds without input (or while unfocused) run at the ambient rates
+IDLE_TIMEOUT = 300
+AMBIENT_FPS = 20
+AMBIENT_SIM_RATE = 30
+
+# Adaptive quality governor state (persisted so a box restarts at the quality it settled on)
+GOVERNOR_ENABLED = False
+GOVERNOR_PARTICLE_SCALE = 1.0
+GOVERNOR_ALPHA_LEVELS = 32
+GOVERNOR_SIM_SCALE = 1.0
+
+# Scripted gravity wells (toggled with W): GravityWell settings per well; the last default one only repels
+GRAVITY_WELLS_ENABLED = False
+DEFAULT_GRAVITY_WELLS = [
+    {'period_x': 60, 'period_y': 45, 'phase': 0.0},
+    {'period_x': 75, 'period_y': 50, 'phase': 2.1},
+    {'period_x': 90, 'period_y': 65, 'phase': 4.2, 'attraction_strength': 0.0, 'repulsion_threshold': 120, 'repulsion_strength': 0.05}
+]
+GRAVITY_WELLS = DEFAULT_GRAVITY_WELLS
+
+# Attraction/repulsion strengths are tuned as per-frame displacements at this rate
+MOTION_REFERENCE_RATE = 60
 
 # Resolutions for dropdown
 resolutions = ["1280x720", "1920x1080", "2560x1440", "3440x1440", "3840x2160"]
+RENDER_SCALES = [0.5, 0.75, 1.0]
 
 # Colors
 BLACK = (0, 0, 0)
@@ -37,13 +84,114 @@ CALMING_COLORS = [
 # Function to create default gradient background
 def create_gradient_background(width, height):
     surface = pygame.Surface((width, height))
-    for y in range(height):
-        # Gradient from black to dark blue
-        blue_value = int(50 * (1 - y / height))
-        color = (0, 0, blue_value)
-        pygame.draw.line(surface, color, (0, y), (width, y))
+    # Gradient from black to dark blue, one column of values broadcast across every row
+    blue_values = (50 * (1 - np.arange(height) / height)).astype(np.uint8)
+    pixels = pygame.surfarray.pixels3d(surface)
+    pixels[:, :, 2] = blue_values
+    del pixels
     return surface
 
+# BackgroundManager class - decodes background.png once and keeps display-format copies per size.
+# get() builds a missing size on the spot; request() hands it to a loader thread and returns a stand-in
+# (the last background stretched, or black) until the finished copy is swapped in on a later call.
+class BackgroundManager:
+    def __init__(self, path='background.png', max_variants=3):
+        self.path = path
+        self.max_variants = max_variants
+        self.variants = OrderedDict()
+        self.image = None
+        self.loaded = False
+        self.load_lock = threading.Lock()
+
+        # Loader thread state; finished is shared with the thread and guarded by lock
+        self.lock = threading.Lock()
+        self.jobs = queue.Queue()
+        self.finished = {}
+        self.pending = set()
+        self.standins = {}
+        self.last = None
+        self.loader = None
+
+    def load(self):
+        with self.load_lock:
+            if not self.loaded:
+                self.loaded = True
+                try:
+                    self.image = pygame.image.load(self.path)
+                except (pygame.error, FileNotFoundError):
+                    self.image = None
+
+    def display_format(self):
+        display = pygame.display.get_surface()
+        if display is None:
+            return None
+        return display.get_bitsize(), display.get_masks()
+
+    def build(self, size, reference):
+        self.load()
+        if self.image is not None:
+            background = pygame.transform.scale(self.image, size)
+        else:
+            background = create_gradient_background(*size)
+        # Match the display's pixel format so the per-frame full-screen blit is a straight copy
+        if reference is not None:
+            background = background.convert(reference)
+        return background
+
+    def store(self, key, background):
+        self.variants[key] = background
+        if len(self.variants) > self.max_variants:
+            self.variants.popitem(last=False)
+
+    def get(self, size):
+        key = (size, self.display_format())
+        background = self.variants.get(key)
+        if background is not None:
+            self.variants.move_to_end(key)
+            return background
+
+        background = self.build(size, pygame.display.get_surface() if key[1] is not None else None)
+        self.store(key, background)
+        return background
+
+    def request(self, size):
+        # Never blocks on decoding or scaling; call every frame and draw whatever comes back
+        with self.lock:
+            finished, self.finished = self.finished, {}
+        for key, background in finished.items():
+            self.pending.discard(key)
+            self.standins.pop(key, None)
+            self.store(key, background)
+
+        key = (size, self.display_format())
+        background = self.variants.get(key)
+        if background is not None:
+            self.variants.move_to_end(key)
+            self.last = background
+            return background
+
+        if key not in self.pending:
+            self.pending.add(key)
+            # The thread converts against a surface in the display format instead of touching the display itself
+            reference = pygame.Surface((1, 1)).convert() if key[1] is not None else None
+            self.jobs.put((key, reference))
+            if self.loader is None:
+                self.loader = threading.Thread(target=self.run_loader, name='background-loader', daemon=True)
+                self.loader.start()
+        if key not in self.standins:
+            if self.last is not None:
+                self.standins[key] = pygame.transform.scale(self.last, size)
+            else:
+                self.standins[key] = pygame.Surface(size)  # plain black until the first background is ready
+        return self.standins[key]
+
+    def run_loader(self):
+        while True:
+            key, reference = self.jobs.get()
+            background = self.build(key[0], reference)
+            with self.lock:
+                self.finished[key] = background
+
 # Slider class for menu
 class Slider:
     def __init__(self, x, y, width, min_val, max_val, initial_val):
@@ -65,14 +213,22 @@ class Slider:
         value_text = font.render(f"{self.value:.2f}", True, (255, 255, 255))
         screen.blit(value_text, (self.x + self.width + 10, self.y - 5))
 
-    def handle_event(self, event):
+    def get_rect(self):
+        # Area touched by draw(): bar, knob overhang and value text
+        return pygame.Rect(self.x - 8, self.y - 8, self.width + 80, 24)
+
+    def get_hit_rect(self):
+        return pygame.Rect(self.x, self.y, self.width + 1, 11)
+
+    def handle_event(self, event, pos=None):
+        pos = event.pos if pos is None else pos
         if event.type == pygame.MOUSEBUTTONDOWN:
-            if self.x <= event.pos[0] <= self.x + self.width and self.y <= event.pos[1] <= self.y + 10:
+            if self.x <= pos[0] <= self.x + self.width and self.y <= pos[1] <= self.y + 10:
                 self.dragging = True
         elif event.type == pygame.MOUSEBUTTONUP:
             self.dragging = False
         elif event.type == pygame.MOUSEMOTION and self.dragging:
-            knob_x = max(self.x, min(self.x + self.width, event.pos[0]))
+            knob_x = max(self.x, min(self.x + self.width, pos[0]))
             self.value = self.min_val + (knob_x - self.x) / self.width * (self.max_val - self.min_val)
 
     def get_value(self):
@@ -102,13 +258,18 @@ class Dropdown:
                 text = font.render(option, True, (0, 0, 0))
                 screen.blit(text, (self.x + 5, self.y + 35 + i * 30))
 
-    def handle_event(self, event):
+    def get_hit_rect(self):
+        # Header plus the option list while expanded
+        return pygame.Rect(self.x, self.y, self.width + 1, 31 + (30 * len(self.options) if self.expanded else 0))
+
+    def handle_event(self, event, pos=None):
+        pos = event.pos if pos is None else pos
         if event.type == pygame.MOUSEBUTTONDOWN:
-            if self.x <= event.pos[0] <= self.x + self.width and self.y <= event.pos[1] <= self.y + 30:
+            if self.x <= pos[0] <= self.x + self.width and self.y <= pos[1] <= self.y + 30:
                 self.expanded = not self.expanded
             elif self.expanded:
                 for i in range(len(self.options)):
-                    if self.x <= event.pos[0] <= self.x + self.width and self.y + 30 + i * 30 <= event.pos[1] <= self.y + 60 + i * 30:
+                    if self.x <= pos[0] <= self.x + self.width and self.y + 30 + i * 30 <= pos[1] <= self.y + 60 + i * 30:
                         self.selected = i
                         self.expanded = False
                         break
@@ -131,20 +292,30 @@ class Button:
         text_surf = font.render(self.text, True, (0, 0, 0))
         screen.blit(text_surf, (self.x + (self.width - text_surf.get_width()) // 2, self.y + (self.height - text_surf.get_height()) // 2))
 
-    def handle_event(self, event):
+    def get_hit_rect(self):
+        return pygame.Rect(self.x, self.y, self.width + 1, self.height + 1)
+
+    def handle_event(self, event, pos=None):
+        pos = event.pos if pos is None else pos
         if event.type == pygame.MOUSEBUTTONDOWN:
-            if self.x <= event.pos[0] <= self.x + self.width and self.y <= event.pos[1] <= self.y + self.height:
+            if self.x <= pos[0] <= self.x + self.width and self.y <= pos[1] <= self.y + self.height:
                 return True
         return False
 
-# OptionsMenu class for organized menu management
+# OptionsMenu class for organized menu management.
+# Widgets keep menu-local coordinates and are drawn once into a cached surface; each frame only
+# widgets whose value changed are redrawn, and events are routed through a screen-space rect index.
 class OptionsMenu:
-    def __init__(self, resolutions, initial_res_index, fps, num_particles, fade_duration, attraction_strength, repulsion_threshold, repulsion_strength, particle_size, pulse_amplitude, pulse_speed):
+    LABELS = ["Fullscreen", "Resolution", "FPS", "Num Particles", "Fade Duration", "Attraction Strength",
+              "Repulsion Threshold", "Repulsion Strength", "Particle Size", "Pulse Amplitude", "Pulse Speed", "Trail Decay", "Render Scale"]
+
+    def __init__(self, resolutions, initial_res_index, fps, num_particles, fade_duration, attraction_strength, repulsion_threshold, repulsion_strength, particle_size, pulse_amplitude, pulse_speed, trail_decay, initial_scale_index=len(RENDER_SCALES) - 1):
         self.alpha = 0
 
         # Labels positions (local) - Resolution dropdown positioned above all sliders
         self.fullscreen_label_pos = (20, 20)
         self.resolution_label_pos = (20, 60)
+        self.render_scale_label_pos = (420, 20)
         self.slider_label_positions = {
             'fps': (20, 115),
             'num_particles': (20, 155),
@@ -154,14 +325,19 @@ class OptionsMenu:
             'repulsion_strength': (20, 315),
             'particle_size': (20, 355),
             'pulse_amplitude': (20, 395),
-            'pulse_speed': (20, 435)
+            'pulse_speed': (20, 435),
+            'trail_decay': (20, 475)
         }
-        self.instr_pos = (20, 520)
-        self.revert_pos = (20, 550)
+        self.status_pos = (20, 530)
+        self.instr_pos = (20, 560)
+        self.revert_pos = (20, 590)
+        self.status_text = ""
 
         # Elements - Resolution dropdown positioned above all sliders
         self.fullscreen_button = Button(200, 15, 200, 30, "Toggle Fullscreen")
         self.resolution_dropdown = Dropdown(200, 55, 200, resolutions, initial_res_index)
+        self.render_scale_dropdown = Dropdown(420, 55, 100, [f"{scale:.0%}" for scale in RENDER_SCALES], initial_scale_index)
+        self.dropdowns = [self.resolution_dropdown, self.render_scale_dropdown]
         self.sliders = {
             'fps': Slider(20, 140, 300, 30, 120, fps),
             'num_particles': Slider(20, 180, 300, 50, 500, num_particles),
@@ -171,14 +347,30 @@ class OptionsMenu:
             'repulsion_strength': Slider(20, 340, 300, 0.01, 0.1, repulsion_strength),
             'particle_size': Slider(20, 380, 300, 1, 10, particle_size),
             'pulse_amplitude': Slider(20, 420, 300, 0.5, 2.0, pulse_amplitude),
-            'pulse_speed': Slider(20, 460, 300, 0.01, 0.1, pulse_speed)
+            'pulse_speed': Slider(20, 460, 300, 0.01, 0.1, pulse_speed),
+            'trail_decay': Slider(20, 500, 300, 0.01, 0.5, trail_decay)
         }
 
+        # Cached rendering
+        self.width = self.get_width()
+        self.height = self.get_height()
+        self.background = pygame.Surface((self.width, self.height))
+        self.background.fill((0, 0, 0))
+        self.surface = None
+        self.font = None
+        self.drawn_states = {}
+
+        # Screen-space hit testing
+        self.origin = (0, 0)
+        self.hit_rects = []
+        self.active_slider = None
+        self.set_origin(0, 0)
+
     def get_width(self):
         # Max right edge
         max_x = max(
             self.fullscreen_button.x + self.fullscreen_button.width,
-            self.resolution_dropdown.x + self.resolution_dropdown.width,
+            max(dropdown.x + dropdown.width for dropdown in self.dropdowns),
             max(slider.x + slider.width + 60 for slider in self.sliders.values()),  # +60 for value text
             max(pos[0] + 150 for pos in self.slider_label_positions.values()),  # label width
             self.instr_pos[0] + 200,  # instruction width
@@ -190,112 +382,172 @@ class OptionsMenu:
         # Max bottom edge
         max_y = max(
             self.fullscreen_button.y + self.fullscreen_button.height,
-            self.resolution_dropdown.y + self.resolution_dropdown.height + 30 * len(self.resolution_dropdown.options),  # expanded
+            max(dropdown.y + dropdown.height + 30 * len(dropdown.options) for dropdown in self.dropdowns),  # expanded
             max(slider.y + 10 for slider in self.sliders.values()),
             self.revert_pos[1] + 20
         )
         return max_y + 20  # padding
 
+    def set_origin(self, x, y):
+        # Screen position of the menu's top-left corner; rebuilds the hit-test index
+        self.origin = (x, y)
+        self.hit_rects = [(self.fullscreen_button.get_hit_rect().move(x, y), self.fullscreen_button)]
+        self.hit_rects += [(slider.get_hit_rect().move(x, y), slider) for slider in self.sliders.values()]
+
+    def get_rect(self):
+        return pygame.Rect(self.origin, (self.width, self.height))
+
     def update_alpha(self, target):
         if self.alpha < target:
             self.alpha = min(self.alpha + 10, target)
         elif self.alpha > target:
             self.alpha = max(self.alpha - 10, target)
 
-    def draw(self, screen, font, offset_x, offset_y):
-        # Adjust element positions
-        self.fullscreen_button.x += offset_x
-        self.fullscreen_button.y += offset_y
-        self.resolution_dropdown.x += offset_x
-        self.resolution_dropdown.y += offset_y
-        for slider in self.sliders.values():
-            slider.x += offset_x
-            slider.y += offset_y
-
-        # Draw labels
-        labels = ["Fullscreen", "Resolution", "FPS", "Num Particles", "Fade Duration", "Attraction Strength",
-                  "Repulsion Threshold", "Repulsion Strength", "Particle Size", "Pulse Amplitude", "Pulse Speed"]
-        for i, label in enumerate(labels):
-            text = font.render(label, True, (255, 255, 255))
-            if i == 0:
-                screen.blit(text, (self.fullscreen_label_pos[0] + offset_x, self.fullscreen_label_pos[1] + offset_y))
-            elif i == 1:
-                screen.blit(text, (self.resolution_label_pos[0] + offset_x, self.resolution_label_pos[1] + offset_y))
+    def widget_states(self):
+        # What each widget's pixels depend on; a change means the widget must be redrawn
+        states = {key: slider.value for key, slider in self.sliders.items()}
+        states['resolution'] = (self.resolution_dropdown.selected, self.resolution_dropdown.expanded)
+        states['render_scale'] = (self.render_scale_dropdown.selected, self.render_scale_dropdown.expanded)
+        states['status'] = self.status_text
+        return states
+
+    def draw_status(self):
+        self.surface.fill((0, 0, 0, 0), pygame.Rect(self.status_pos, (self.width - self.status_pos[0], 20)))
+        self.surface.blit(self.font.render(self.status_text, True, (200, 200, 200)), self.status_pos)
+
+    def render_static(self):
+        # Labels, instructions and the button never change after construction
+        surface, font = self.surface, self.font
+        surface.fill((0, 0, 0, 0))
+        label_positions = [self.fullscreen_label_pos, self.resolution_label_pos] + list(self.slider_label_positions.values()) + [self.render_scale_label_pos]
+        for label, pos in zip(self.LABELS, label_positions):
+            surface.blit(font.render(label, True, (255, 255, 255)), pos)
+        surface.blit(font.render("Press O to toggle menu", True, (255, 255, 255)), self.instr_pos)
+        surface.blit(font.render("Press R to Revert to Defaults", True, (255, 255, 255)), self.revert_pos)
+        self.fullscreen_button.draw(surface, font)
+
+    def draw(self, screen, font):
+        if self.surface is None or font is not self.font:
+            self.surface = pygame.Surface((self.width, self.height), pygame.SRCALPHA)
+            self.font = font
+            self.drawn_states = {}
+
+        states = self.widget_states()
+        if states != self.drawn_states:
+            if not self.drawn_states or any(states[key] != self.drawn_states[key] for key in ('resolution', 'render_scale')) or \
+                    any(dropdown.expanded for dropdown in self.dropdowns):
+                # Dropdown lists overlap the sliders, so any change involving one redraws everything
+                self.render_static()
+                for slider in self.sliders.values():
+                    slider.draw(self.surface, font)
+                self.draw_status()
+                # Expanded list drawn last so it stays on top
+                for dropdown in sorted(self.dropdowns, key=lambda dropdown: dropdown.expanded):
+                    dropdown.draw(self.surface, font)
             else:
-                key = list(self.slider_label_positions.keys())[i-2]
-                screen.blit(text, (self.slider_label_positions[key][0] + offset_x, self.slider_label_positions[key][1] + offset_y))
-
-        # Draw elements
-        self.resolution_dropdown.draw(screen, font)
-        self.fullscreen_button.draw(screen, font)
-        for slider in self.sliders.values():
-            slider.draw(screen, font)
-
-        # Instructions
-        instr = font.render("Press O to toggle menu", True, (255, 255, 255))
-        screen.blit(instr, (self.instr_pos[0] + offset_x, self.instr_pos[1] + offset_y))
-        revert = font.render("Press R to Revert to Defaults", True, (255, 255, 255))
-        screen.blit(revert, (self.revert_pos[0] + offset_x, self.revert_pos[1] + offset_y))
-
-        # Restore positions
-        self.fullscreen_button.x -= offset_x
-        self.fullscreen_button.y -= offset_y
-        self.resolution_dropdown.x -= offset_x
-        self.resolution_dropdown.y -= offset_y
-        for slider in self.sliders.values():
-            slider.x -= offset_x
-            slider.y -= offset_y
-
-    def handle_event(self, event, offset_x, offset_y):
-        # Adjust element positions for event handling
-        self.fullscreen_button.x += offset_x
-        self.fullscreen_button.y += offset_y
-        self.resolution_dropdown.x += offset_x
-        self.resolution_dropdown.y += offset_y
-        for slider in self.sliders.values():
-            slider.x += offset_x
-            slider.y += offset_y
-
-        # Handle events
-        result = self.fullscreen_button.handle_event(event)
-        self.resolution_dropdown.handle_event(event)
-        for slider in self.sliders.values():
-            slider.handle_event(event)
-
-        # Restore positions
-        self.fullscreen_button.x -= offset_x
-        self.fullscreen_button.y -= offset_y
-        self.resolution_dropdown.x -= offset_x
-        self.resolution_dropdown.y -= offset_y
-        for slider in self.sliders.values():
-            slider.x -= offset_x
-            slider.y -= offset_y
-
-        return result  # for fullscreen toggle
-
-# Load config
-def load_config():
-    global WIDTH, HEIGHT, FPS, ATTRACTION_STRENGTH, REPULSION_THRESHOLD, REPULSION_STRENGTH, FADE_DURATION, NUM_PARTICLES, PARTICLE_SIZE, PULSE_AMPLITUDE, PULSE_SPEED
+                for key, slider in self.sliders.items():
+                    if states[key] != self.drawn_states[key]:
+                        self.surface.fill((0, 0, 0, 0), slider.get_rect())
+                        slider.draw(self.surface, font)
+                if states['status'] != self.drawn_states['status']:
+                    self.draw_status()
+            self.drawn_states = states
+
+        self.background.set_alpha(self.alpha)
+        screen.blit(self.background, self.origin)
+        screen.blit(self.surface, self.origin)
+
+    def handle_event(self, event):
+        if event.type not in (pygame.MOUSEBUTTONDOWN, pygame.MOUSEBUTTONUP, pygame.MOUSEMOTION):
+            return False
+        pos = (event.pos[0] - self.origin[0], event.pos[1] - self.origin[1])
+
+        if event.type == pygame.MOUSEMOTION:
+            if self.active_slider is not None:
+                self.active_slider.handle_event(event, pos)
+            return False
+        if event.type == pygame.MOUSEBUTTONUP:
+            if self.active_slider is not None:
+                self.active_slider.handle_event(event, pos)
+                self.active_slider = None
+            return False
+
+        # Mouse button down: an open dropdown takes every click (select, close or ignore)
+        for dropdown in sorted(self.dropdowns, key=lambda dropdown: not dropdown.expanded):
+            if dropdown.expanded or dropdown.get_hit_rect().collidepoint(pos):
+                dropdown.handle_event(event, pos)
+                return False
+        for rect, widget in self.hit_rects:
+            if rect.collidepoint(event.pos):
+                if widget is self.fullscreen_button:
+                    return widget.handle_event(event, pos)  # for fullscreen toggle
+                widget.handle_event(event, pos)
+                if widget.dragging:
+                    self.active_slider = widget
+                break
+        return False
+
+# Load config.json at startup; returns the settings that were applied. Invalid settings are reported and left at their defaults.
+def load_config(path='config.json'):
     try:
-        with open('config.json', 'r') as f:
-            config = json.load(f)
-        WIDTH = config.get('width', 800)
-        HEIGHT = config.get('height', 600)
-        FPS = config.get('fps', 60)
-        ATTRACTION_STRENGTH = config.get('attraction_strength', 0.01)
-        REPULSION_THRESHOLD = config.get('repulsion_threshold', 50)
-        REPULSION_STRENGTH = config.get('repulsion_strength', 0.02)
-        FADE_DURATION = config.get('fade_duration', 3)
-        NUM_PARTICLES = config.get('num_particles', 200)
-        PARTICLE_SIZE = config.get('particle_size', 1)
-        PULSE_AMPLITUDE = config.get('pulse_amplitude', 1.0)
-        PULSE_SPEED = config.get('pulse_speed', 0.05)
-    except:
-        pass
+        config, errors = read_config(path)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        print(f"{path}: {e}", file=sys.stderr)
+        return {}
+    for message in errors:
+        print(f"{path}: {message}", file=sys.stderr)
+    apply_config(config)
+    return config
+
+# Index of a window size in the resolution dropdown; sizes it doesn't list fall back to the first entry
+def resolution_index(width, height):
+    for i, res in enumerate(resolutions):
+        w, h = res.split('x')
+        if int(w) == width and int(h) == height:
+            return i
+    return 0
+
+# Set the settings globals from a config dict (config.json, or the header of a replay log)
+def apply_config(config):
+    global WIDTH, HEIGHT, FPS, ATTRACTION_STRENGTH, REPULSION_THRESHOLD, REPULSION_STRENGTH, FADE_DURATION, NUM_PARTICLES, PARTICLE_SIZE, PULSE_AMPLITUDE, PULSE_SPEED, SIM_RATE, DIRTY_RECTS
+    global RENDER_SCALE, RENDER_SCALE_SMOOTH, TRAILS, TRAIL_DECAY, PARALLAX, GRAVITY_WELLS_ENABLED, GRAVITY_WELLS, GOVERNOR_ENABLED, GOVERNOR_PARTICLE_SCALE, GOVERNOR_ALPHA_LEVELS, GOVERNOR_SIM_SCALE, IDLE_TIMEOUT, AMBIENT_FPS, AMBIENT_SIM_RATE
+    WIDTH = config.get('width', 800)
+    HEIGHT = config.get('height', 600)
+    FPS = config.get('fps', 60)
+    ATTRACTION_STRENGTH = config.get('attraction_strength', 0.01)
+    REPULSION_THRESHOLD = config.get('repulsion_threshold', 50)
+    REPULSION_STRENGTH = config.get('repulsion_strength', 0.02)
+    FADE_DURATION = config.get('fade_duration', 3)
+    NUM_PARTICLES = config.get('num_particles', 200)
+    PARTICLE_SIZE = config.get('particle_size', 1)
+    PULSE_AMPLITUDE = config.get('pulse_amplitude', 1.0)
+    PULSE_SPEED = config.get('pulse_speed', 0.05)
+    SIM_RATE = config.get('sim_rate', 60)
+    DIRTY_RECTS = config.get('dirty_rects', False)
+    RENDER_SCALE = config.get('render_scale', 1.0)
+    RENDER_SCALE_SMOOTH = config.get('render_scale_smooth', False)
+    TRAILS = config.get('trails', False)
+    TRAIL_DECAY = config.get('trail_decay', 0.1)
+    PARALLAX = config.get('parallax', False)
+    GRAVITY_WELLS_ENABLED = config.get('gravity_wells_enabled', False)
+    GRAVITY_WELLS = config.get('gravity_wells', DEFAULT_GRAVITY_WELLS)
+    GOVERNOR_ENABLED = config.get('governor', False)
+    GOVERNOR_PARTICLE_SCALE = config.get('governor_particle_scale', 1.0)
+    GOVERNOR_ALPHA_LEVELS = config.get('governor_alpha_levels', 32)
+    GOVERNOR_SIM_SCALE = config.get('governor_sim_scale', 1.0)
+    IDLE_TIMEOUT = config.get('idle_timeout', 300)
+    AMBIENT_FPS = config.get('ambient_fps', 20)
+    AMBIENT_SIM_RATE = config.get('ambient_sim_rate', 30)
 
 # Save config
 def save_config():
-    config = {
+    with open('config.json', 'w') as f:
+        json.dump(current_config(), f)
+
+def current_config():
+    return {
         'width': WIDTH,
         'height': HEIGHT,
         'fps': FPS,
@@ -306,14 +558,29 @@ def save_config():
         'num_particles': NUM_PARTICLES,
         'particle_size': PARTICLE_SIZE,
         'pulse_amplitude': PULSE_AMPLITUDE,
-        'pulse_speed': PULSE_SPEED
+        'pulse_speed': PULSE_SPEED,
+        'sim_rate': SIM_RATE,
+        'dirty_rects': DIRTY_RECTS,
+        'render_scale': RENDER_SCALE,
+        'render_scale_smooth': RENDER_SCALE_SMOOTH,
+        'trails': TRAILS,
+        'trail_decay': TRAIL_DECAY,
+        'parallax': PARALLAX,
+        'gravity_wells_enabled': GRAVITY_WELLS_ENABLED,
+        'gravity_wells': GRAVITY_WELLS,
+        'governor': GOVERNOR_ENABLED,
+        'governor_particle_scale': GOVERNOR_PARTICLE_SCALE,
+        'governor_alpha_levels': GOVERNOR_ALPHA_LEVELS,
+        'governor_sim_scale': GOVERNOR_SIM_SCALE,
+        'idle_timeout': IDLE_TIMEOUT,
+        'ambient_fps': AMBIENT_FPS,
+        'ambient_sim_rate': AMBIENT_SIM_RATE
     }
-    with open('config.json', 'w') as f:
-        json.dump(config, f)
 
 # Revert to default settings
 def revert_to_defaults(menu):
-    global WIDTH, HEIGHT, FPS, ATTRACTION_STRENGTH, REPULSION_THRESHOLD, REPULSION_STRENGTH, FADE_DURATION, NUM_PARTICLES, PARTICLE_SIZE, PULSE_AMPLITUDE, PULSE_SPEED
+    global WIDTH, HEIGHT, FPS, ATTRACTION_STRENGTH, REPULSION_THRESHOLD, REPULSION_STRENGTH, FADE_DURATION, NUM_PARTICLES, PARTICLE_SIZE, PULSE_AMPLITUDE, PULSE_SPEED, SIM_RATE, DIRTY_RECTS
+    global RENDER_SCALE, RENDER_SCALE_SMOOTH, TRAILS, TRAIL_DECAY, PARALLAX, GRAVITY_WELLS_ENABLED, GRAVITY_WELLS, GOVERNOR_ENABLED, GOVERNOR_PARTICLE_SCALE, GOVERNOR_ALPHA_LEVELS, GOVERNOR_SIM_SCALE, IDLE_TIMEOUT, AMBIENT_FPS, AMBIENT_SIM_RATE
     WIDTH = 800
     HEIGHT = 600
     FPS = 60
@@ -325,6 +592,24 @@ def revert_to_defaults(menu):
     PARTICLE_SIZE = 1
     PULSE_AMPLITUDE = 1.0
     PULSE_SPEED = 0.05
+    SIM_RATE = 60
+    DIRTY_RECTS = False
+    RENDER_SCALE = 1.0
+    RENDER_SCALE_SMOOTH = False
+    TRAILS = False
+    TRAIL_DECAY = 0.1
+    PARALLAX = False
+    GRAVITY_WELLS_ENABLED = False
+    GRAVITY_WELLS = DEFAULT_GRAVITY_WELLS
+    GOVERNOR_ENABLED = False
+    GOVERNOR_PARTICLE_SCALE = 1.0
+    GOVERNOR_ALPHA_LEVELS = 32
+    GOVERNOR_SIM_SCALE = 1.0
+    IDLE_TIMEOUT = 300
+    AMBIENT_FPS = 20
+    AMBIENT_SIM_RATE = 30
+    if menu is None:
+        return
     # Update sliders
     menu.sliders['fps'].value = FPS
     menu.sliders['num_particles'].value = NUM_PARTICLES
@@ -335,215 +620,1817 @@ def revert_to_defaults(menu):
     menu.sliders['particle_size'].value = PARTICLE_SIZE
     menu.sliders['pulse_amplitude'].value = PULSE_AMPLITUDE
     menu.sliders['pulse_speed'].value = PULSE_SPEED
+    menu.sliders['trail_decay'].value = TRAIL_DECAY
     # Update dropdown
     for i, res in enumerate(resolutions):
         w, h = res.split('x')
         if int(w) == WIDTH and int(h) == HEIGHT:
             menu.resolution_dropdown.selected = i
             break
+    menu.render_scale_dropdown.selected = RENDER_SCALES.index(RENDER_SCALE)
 
-# Star class
-class Star:
-    def __init__(self, x, y, size, speed):
-        self.x = x
-        self.y = y
-        self.base_size = size
-        self.size = size
-        self.speed = speed
-        self.color = random.choice(CALMING_COLORS)
-        self.pulse_amplitude = random.uniform(0.5, 1.5)
-        self.pulse_speed = random.uniform(0.01, 0.05)
-        self.state = 'fading_in'
-        self.alpha = 0
-        self.fade_in_rate = 255 / (random.uniform(FADE_DURATION - 0.5, FADE_DURATION + 0.5) * FPS)
-        self.active_timer = 0
-        self.active_duration = random.uniform(2, 5) * FPS
-        self.fade_out_rate = 255 / (random.uniform(FADE_DURATION - 0.5, FADE_DURATION + 0.5) * FPS)
-
-    def respawn(self, screen_width, screen_height):
-        self.x = random.randint(0, screen_width)
-        self.y = random.randint(0, screen_height)
-        self.color = random.choice(CALMING_COLORS)
-        self.base_size = random.randint(1, 3)
-        self.size = self.base_size
-        self.pulse_amplitude = random.uniform(0.5, 1.5)
-        self.pulse_speed = random.uniform(0.01, 0.05)
-        self.state = 'fading_in'
-        self.alpha = 0
-        self.fade_in_rate = 255 / (random.uniform(FADE_DURATION - 0.5, FADE_DURATION + 0.5) * FPS)
-        self.active_timer = 0
-        self.active_duration = random.uniform(2, 5) * FPS
-        self.fade_out_rate = 255 / (random.uniform(FADE_DURATION - 0.5, FADE_DURATION + 0.5) * FPS)
+# Largest star radius that PARTICLE_SIZE/PULSE_AMPLITUDE allow (base size plus pulse swing)
+def star_radius_limit(particle_size, pulse_amplitude):
+    return int(max(3, particle_size) + 1.5 * max(1.0, pulse_amplitude))
+
+# SpriteCache class - pre-rendered star circles keyed by (palette color, radius, alpha level)
+class SpriteCache:
+    def __init__(self, max_entries=1024, alpha_levels=32):
+        self.max_entries = max_entries
+        self.alpha_levels = alpha_levels
+        self.sprites = OrderedDict()
+        self.max_radius = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def configure(self, particle_size, pulse_amplitude):
+        # Drop every sprite when the possible radius range changes
+        max_radius = star_radius_limit(particle_size, pulse_amplitude)
+        if max_radius != self.max_radius:
+            self.max_radius = max_radius
+            self.sprites.clear()
+
+    def set_alpha_levels(self, alpha_levels):
+        if alpha_levels != self.alpha_levels:
+            self.alpha_levels = alpha_levels
+            self.sprites.clear()
+
+    def quantize_alpha(self, alpha):
+        return int(alpha * (self.alpha_levels - 1) / 255 + 0.5)
+
+    def get(self, color_index, radius, alpha):
+        key = (color_index, min(max(1, radius), self.max_radius), self.quantize_alpha(alpha))
+        sprite = self.sprites.get(key)
+        if sprite is not None:
+            self.hits += 1
+            self.sprites.move_to_end(key)
+            return sprite
+        self.misses += 1
+        sprite = self.render(*key)
+        self.sprites[key] = sprite
+        if len(self.sprites) > self.max_entries:
+            self.sprites.popitem(last=False)
+            self.evictions += 1
+        return sprite
+
+    def render(self, color_index, radius, level):
+        alpha = int(level * 255 / (self.alpha_levels - 1) + 0.5)
+        sprite = pygame.Surface((radius*2 + 4, radius*2 + 4), pygame.SRCALPHA)
+        pygame.draw.circle(sprite, (*CALMING_COLORS[color_index], alpha), (radius + 2, radius + 2), radius)
+        return sprite
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self.sprites),
+            'max_entries': self.max_entries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / lookups if lookups else 0.0
+        }
+
+# SpatialHashGrid class - uniform grid over star positions for neighbour queries.
+# Stars are kept sorted by cell key; each rebuild re-sorts starting from the previous
+# order with a stable (run-adaptive) sort, so the cost stays close to linear while most
+# stars stay in their cell from one step to the next.
+class SpatialHashGrid:
+    NEIGHBOR_OFFSETS = [(-1, -1), (0, -1), (1, -1), (-1, 0), (0, 0), (1, 0), (-1, 1), (0, 1), (1, 1)]
+
+    def __init__(self, cell_size, max_per_cell=4):
+        self.cell_size = cell_size
+        self.max_per_cell = max_per_cell
+        self.order = np.zeros(0, dtype=np.intp)
+        self.keys = np.zeros(0, dtype=np.int64)
+        self.cell_start = np.zeros(1, dtype=np.intp)
+        self.columns = 0
+
+    def rebuild(self, x, y, cell_size):
+        # Cell coordinates are shifted by one so the neighbours of edge cells never alias. Stars pushed past the
+        # left or top edge (they are only wrapped after the forces) share the edge cells rather than going negative.
+        column = np.maximum(x // cell_size, 0).astype(np.int64) + 1
+        row = np.maximum(y // cell_size, 0).astype(np.int64) + 1
+        columns = int(column.max(initial=0)) + 2
+        rows = int(row.max(initial=0)) + 2
+        if cell_size != self.cell_size or columns != self.columns or len(self.order) != len(x):
+            self.order = np.arange(len(x))
+        self.cell_size = cell_size
+        self.columns = columns
+        self.keys = row * columns + column
+
+        keys = self.keys[self.order]
+        resort = np.argsort(keys, kind='stable')
+        self.order = self.order[resort]
+        # Dense cell table: stars of cell k are order[cell_start[k]:cell_start[k + 1]]
+        self.cell_start = np.searchsorted(keys[resort], np.arange(rows * columns + 1))
+
+    def pairs(self, idx):
+        # Candidate (i, j) pairs between each star in idx and up to max_per_cell stars of
+        # every neighbouring cell, so the pair count grows linearly with the star count.
+        # Self pairs (i, i) are included; callers drop them with their distance test.
+        firsts, seconds = [], []
+        keys = self.keys[idx]
+        for dx, dy in self.NEIGHBOR_OFFSETS:
+            cell = keys + (dy * self.columns + dx)
+            start = self.cell_start[cell]
+            count = np.minimum(self.cell_start[cell + 1] - start, self.max_per_cell)
+            total = int(count.sum())
+            if total == 0:
+                continue
+            offsets = np.arange(total) - np.repeat(np.cumsum(count) - count, count)
+            firsts.append(np.repeat(idx, count))
+            seconds.append(self.order[np.repeat(start, count) + offsets])
+        if not firsts:
+            return np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.intp)
+        return np.concatenate(firsts), np.concatenate(seconds)
+
+# Fraction of REPULSION_THRESHOLD inside which neighbouring stars push apart rather than cluster
+NEIGHBOR_SEPARATION = 0.5
+
+# Attractors: one row per source as (x, y, attraction_strength, repulsion_threshold, repulsion_strength).
+# Stars inside a source's threshold are pushed away from it, the rest are pulled towards it.
+ATTRACTOR_FIELDS = ('x', 'y', 'attraction_strength', 'repulsion_threshold', 'repulsion_strength')
+
+# Rows for pointer sources (mouse or touch points), using the strengths from the menu sliders
+def pointer_attractors(points):
+    return np.array([(x, y, ATTRACTION_STRENGTH, REPULSION_THRESHOLD, REPULSION_STRENGTH) for x, y in points],
+                    dtype=np.float64).reshape(-1, len(ATTRACTOR_FIELDS))
+
+# GravityWell class - scripted attractor drifting on a slow Lissajous path, driven by simulation time
+class GravityWell:
+    def __init__(self, attraction_strength=0.005, repulsion_threshold=40, repulsion_strength=0.02, period_x=60, period_y=45, phase=0.0, extent=0.35):
+        self.attraction_strength = attraction_strength
+        self.repulsion_threshold = repulsion_threshold
+        self.repulsion_strength = repulsion_strength
+        self.period_x = period_x  # seconds per horizontal sweep
+        self.period_y = period_y
+        self.phase = phase
+        self.extent = extent  # fraction of the screen either side of the centre
+
+    def row(self, time_ms, screen_width, screen_height):
+        t = time_ms * 0.001 * 2 * math.pi
+        x = screen_width * (0.5 + self.extent * math.sin(t / self.period_x + self.phase))
+        y = screen_height * (0.5 + self.extent * math.sin(t / self.period_y + self.phase))
+        return (x, y, self.attraction_strength, self.repulsion_threshold, self.repulsion_strength)
+
+# AttractorSet class - this frame's sources: every touch point, or the mouse while nobody is touching
+# (SDL also reports the first finger as the mouse), plus the scripted gravity wells when enabled
+class AttractorSet:
+    def __init__(self, wells=()):
+        self.fingers = {}
+        self.wells = [GravityWell(**well) for well in wells]
+        self.wells_enabled = False
+
+    def handle_event(self, event):
+        # Finger positions are normalised to 0..1 and scaled to the window in sources()
+        if event.type in (pygame.FINGERDOWN, pygame.FINGERMOTION):
+            self.fingers[(event.touch_id, event.finger_id)] = (event.x, event.y)
+        elif event.type == pygame.FINGERUP:
+            self.fingers.pop((event.touch_id, event.finger_id), None)
+
+    def touches(self):
+        return list(self.fingers.values())
+
+    def sources(self, mouse, screen_width, screen_height, time_ms):
+        if self.fingers:
+            points = [(x * screen_width, y * screen_height) for x, y in self.fingers.values()]
+        else:
+            points = [mouse]
+        rows = pointer_attractors(points)
+        if self.wells_enabled and self.wells:
+            rows = np.vstack([rows, [well.row(time_ms, screen_width, screen_height) for well in self.wells]])
+        return rows
+
+# Default storage for StarField blocks: (float block, int block) for a given star count
+def allocate_star_arrays(count):
+    return (np.zeros((len(StarField.FLOAT_FIELDS), count)),
+            np.zeros((len(StarField.INT_FIELDS), count), dtype=np.int32))
+
+# Star states for the array-backed star field
+STATE_FADING_IN = 0
+STATE_ACTIVE = 1
+STATE_FADING_OUT = 2
+
+# StarField class - all stars kept in contiguous arrays and updated in batches, one array element per star.
+# Advances by a time step in seconds rather than one frame: fade rates are alpha per second and timers count seconds.
+class StarField:
+    FLOAT_FIELDS = ('x', 'y', 'prev_x', 'prev_y', 'base_size', 'size', 'pulse_amplitude', 'pulse_speed', 'alpha',
+                    'fade_in_rate', 'active_timer', 'active_duration', 'fade_out_rate')
+    INT_FIELDS = ('state', 'color')
+
+    def __init__(self, count, screen_width, screen_height, seed=None, allocator=allocate_star_arrays, size_range=(1, 3), pulse_range=(0.5, 1.5)):
+        self.rng = np.random.default_rng(seed)
+        # Base size (integers, inclusive) and pulse amplitude ranges new stars are drawn from
+        self.size_range = size_range
+        self.pulse_range = pulse_range
+        self.colors = np.array(CALMING_COLORS, dtype=np.uint8)
+        self.flocking = False
+        self.grid = SpatialHashGrid(REPULSION_THRESHOLD)
+        self.neighbor_pairs = 0
+        self.allocator = allocator
+        self._allocate(0)
+        self.resize(count, screen_width, screen_height)
+
+    @classmethod
+    def view(cls, floats, ints, rng, size_range=(1, 3), pulse_range=(0.5, 1.5)):
+        # A StarField over existing blocks (e.g. one chunk of a shared-memory field); updates write through
+        field = cls.__new__(cls)
+        field.rng = rng
+        field.size_range = size_range
+        field.pulse_range = pulse_range
+        field.colors = np.array(CALMING_COLORS, dtype=np.uint8)
+        field.flocking = False
+        field.grid = None
+        field.neighbor_pairs = 0
+        field.allocator = None
+        field.floats, field.ints = floats, ints
+        field._bind()
+        return field
+
+    def _allocate(self, count):
+        self.floats, self.ints = self.allocator(count)
+        self._bind()
+
+    def set_allocator(self, allocator):
+        # Move the field blocks into storage from another allocator
+        floats, ints = self.floats, self.ints
+        self.allocator = allocator
+        self._allocate(len(self))
+        self.floats[:] = floats
+        self.ints[:] = ints
+
+    def _bind(self):
+        # Expose each row of the field blocks as a named array (self.x, self.alpha, ...)
+        for i, name in enumerate(self.FLOAT_FIELDS):
+            setattr(self, name, self.floats[i])
+        for i, name in enumerate(self.INT_FIELDS):
+            setattr(self, name, self.ints[i])
+
+    def __len__(self):
+        return self.floats.shape[1]
+
+    def digest(self):
+        # Fingerprint of the whole star state, to check that a replay reproduced a recorded run
+        return hashlib.sha1(np.ascontiguousarray(self.floats).tobytes() + np.ascontiguousarray(self.ints).tobytes()).hexdigest()
+
+    def resize(self, count, screen_width, screen_height):
+        old_count = len(self)
+        if count == old_count:
+            return
+        floats, ints = self.floats, self.ints
+        self._allocate(count)
+        keep = min(old_count, count)
+        self.floats[:, :keep] = floats[:, :keep]
+        self.ints[:, :keep] = ints[:, :keep]
+        if count > old_count:
+            self.respawn(np.arange(old_count, count), screen_width, screen_height)
+
+    def respawn(self, idx, screen_width, screen_height):
+        n = len(idx)
+        if n == 0:
+            return
+        rng = self.rng
+        self.x[idx] = rng.integers(0, screen_width, n, endpoint=True)
+        self.y[idx] = rng.integers(0, screen_height, n, endpoint=True)
+        self.prev_x[idx] = self.x[idx]
+        self.prev_y[idx] = self.y[idx]
+        self.color[idx] = rng.integers(0, len(CALMING_COLORS), n)
+        self.base_size[idx] = rng.integers(self.size_range[0], self.size_range[1], n, endpoint=True)
+        self.size[idx] = self.base_size[idx]
+        self.pulse_amplitude[idx] = rng.uniform(self.pulse_range[0], self.pulse_range[1], n)
+        self.pulse_speed[idx] = rng.uniform(0.01, 0.05, n)
+        self.state[idx] = STATE_FADING_IN
+        self.alpha[idx] = 0
+        self.fade_in_rate[idx] = 255 / rng.uniform(FADE_DURATION - 0.5, FADE_DURATION + 0.5, n)
+        self.active_timer[idx] = 0
+        self.active_duration[idx] = rng.uniform(2, 5, n)
+        self.fade_out_rate[idx] = 255 / rng.uniform(FADE_DURATION - 0.5, FADE_DURATION + 0.5, n)
+
+    def update(self, attractors, screen_width, screen_height, time_ms, dt):
+        # attractors: (K, len(ATTRACTOR_FIELDS)) array, e.g. from pointer_attractors or AttractorSet.sources
+        self.prev_x[:] = self.x
+        self.prev_y[:] = self.y
 
-    def update(self, mouse_x, mouse_y, screen_width, screen_height):
         # Pulsing size effect
-        self.size = self.base_size + self.pulse_amplitude * math.sin(pygame.time.get_ticks() * 0.001 * self.pulse_speed)
-        self.size = max(1, self.size)
-
-        # State-based fading
-        if self.state == 'fading_in':
-            self.alpha += self.fade_in_rate
-            if self.alpha >= 255:
-                self.alpha = 255
-                self.state = 'active'
-                self.active_timer = 0
-        elif self.state == 'active':
-            self.active_timer += 1
-            if self.active_timer >= self.active_duration:
-                self.state = 'fading_out'
-        elif self.state == 'fading_out':
-            self.alpha -= self.fade_out_rate
-            if self.alpha <= 0:
-                self.respawn(screen_width, screen_height)
-                return
-
-        # Proximity-based movement (only if visible)
-        if self.alpha > 0:
-            dx = mouse_x - self.x
-            dy = mouse_y - self.y
-            distance = math.sqrt(dx**2 + dy**2)
-
-            if distance > 0:
-                if distance < REPULSION_THRESHOLD:
-                    # Repulsion for close particles
-                    force = REPULSION_STRENGTH / distance
-                    dx = -dx / distance * force
-                    dy = -dy / distance * force
-                    # Add randomness for swirling effect
-                    self.x += random.uniform(-0.1, 0.1)
-                    self.y += random.uniform(-0.1, 0.1)
-                else:
-                    # Attraction for distant particles
-                    force = ATTRACTION_STRENGTH * (distance / 100)
-                    dx = dx / distance * force
-                    dy = dy / distance * force
-
-                self.x += dx
-                self.y += dy
-
-        # Wrap around screen
-        if self.x < 0:
-            self.x = screen_width
-        elif self.x > screen_width:
-            self.x = 0
-        if self.y < 0:
-            self.y = screen_height
-        elif self.y > screen_height:
-            self.y = 0
-
-    def draw(self, screen):
-        if self.alpha > 0:
-            surface = pygame.Surface((int(self.size*2) + 4, int(self.size*2) + 4), pygame.SRCALPHA)
-            pygame.draw.circle(surface, (*self.color, int(self.alpha)), (int(self.size) + 2, int(self.size) + 2), int(self.size))
-            screen.blit(surface, (int(self.x - self.size - 2), int(self.y - self.size - 2)))
+        np.sin(time_ms * 0.001 * self.pulse_speed, out=self.size)
+        self.size *= self.pulse_amplitude
+        self.size += self.base_size
+        np.maximum(self.size, 1, out=self.size)
+
+        # State-based fading (masks taken up front so each star advances at most one state per frame)
+        fading_in = self.state == STATE_FADING_IN
+        active = self.state == STATE_ACTIVE
+        fading_out = self.state == STATE_FADING_OUT
+
+        np.add(self.alpha, self.fade_in_rate * dt, out=self.alpha, where=fading_in)
+        faded_in = fading_in & (self.alpha >= 255)
+        self.alpha[faded_in] = 255
+        self.state[faded_in] = STATE_ACTIVE
+        self.active_timer[faded_in] = 0
+
+        np.add(self.active_timer, dt, out=self.active_timer, where=active)
+        self.state[active & (self.active_timer >= self.active_duration)] = STATE_FADING_OUT
+
+        np.subtract(self.alpha, self.fade_out_rate * dt, out=self.alpha, where=fading_out)
+        # Respawned stars come back with alpha 0 inside the screen, so they skip movement and wrapping
+        self.respawn(np.flatnonzero(fading_out & (self.alpha <= 0)), screen_width, screen_height)
+
+        # Proximity-based movement (only if visible); all K sources act on the n visible stars as one (K, n) batch
+        visible = np.flatnonzero(self.alpha > 0)
+        ax, ay, attraction, threshold, repulsion = np.asarray(attractors, dtype=np.float64).reshape(-1, len(ATTRACTOR_FIELDS)).T[:, :, None]
+        dx = ax - self.x[visible]
+        dy = ay - self.y[visible]
+        distance = np.hypot(dx, dy)
+        moving = distance > 0
+
+        repel = moving & (distance < threshold)
+        # Repulsion for close particles, attraction for distant ones; a star right on a source is left alone
+        with np.errstate(divide='ignore', invalid='ignore'):
+            force = np.where(repel, -repulsion / distance, attraction * (distance / 100))
+            motion = dt * MOTION_REFERENCE_RATE
+            force *= motion / distance
+        force[~moving] = 0
+        self.x[visible] += (dx * force).sum(axis=0)
+        self.y[visible] += (dy * force).sum(axis=0)
+
+        # Add randomness for swirling effect (once per star, however many sources repel it)
+        swirling = visible[repel.any(axis=0)]
+        self.x[swirling] += self.rng.uniform(-0.1, 0.1, len(swirling)) * motion
+        self.y[swirling] += self.rng.uniform(-0.1, 0.1, len(swirling)) * motion
+
+        if self.flocking:
+            self.apply_neighbor_forces(motion)
+
+        self.wrap(screen_width, screen_height)
+
+    def wrap(self, screen_width, screen_height):
+        # Wrap around screen (wrapped stars are not interpolated across the screen)
+        for pos, prev, limit in ((self.x, self.prev_x, screen_width), (self.y, self.prev_y, screen_height)):
+            below = pos < 0
+            above = pos > limit
+            pos[below] = limit
+            pos[above] = 0
+            wrapped = below | above
+            prev[wrapped] = pos[wrapped]
+
+    def apply_neighbor_forces(self, motion):
+        # Star-to-star version of the mouse forces: neighbours closer than NEIGHBOR_SEPARATION * REPULSION_THRESHOLD
+        # repel, those further out (up to REPULSION_THRESHOLD) attract. Forces are averaged per star.
+        self.grid.rebuild(self.x, self.y, REPULSION_THRESHOLD)
+        # Query in grid order so neighbouring stars are processed together
+        order = self.grid.order
+        first, second = self.grid.pairs(order[self.alpha[order] > 0])
+        dx = self.x[second] - self.x[first]
+        dy = self.y[second] - self.y[first]
+        distance = dx * dx + dy * dy
+        near = (distance > 0) & (distance < REPULSION_THRESHOLD ** 2) & (self.alpha[second] > 0)
+        first, dx, dy = first[near], dx[near], dy[near]
+        distance = np.sqrt(distance[near])
+        self.neighbor_pairs = len(first)
+        if len(first) == 0:
+            return
+
+        repel = distance < REPULSION_THRESHOLD * NEIGHBOR_SEPARATION
+        force = np.where(repel, -REPULSION_STRENGTH / np.maximum(distance, 1), ATTRACTION_STRENGTH * (distance / 100))
+        force *= motion / distance
+        n = len(self)
+        neighbors = np.maximum(np.bincount(first, minlength=n), 1)
+        self.x += np.bincount(first, dx * force, minlength=n) / neighbors
+        self.y += np.bincount(first, dy * force, minlength=n) / neighbors
+
+    def positions(self, blend, scale=1.0):
+        # Render positions interpolated between the previous and current simulation step
+        if blend >= 1:
+            x, y = self.x, self.y
+        else:
+            x, y = self.prev_x + (self.x - self.prev_x) * blend, self.prev_y + (self.y - self.prev_y) * blend
+        if scale != 1:
+            x, y = x * scale, y * scale
+        return x, y
+
+    def draw(self, screen, sprites, blend=1.0, scale=1.0):
+        x, y = self.positions(blend, scale)
+        visible = np.flatnonzero(self.alpha > 0)
+        size = self.size[visible] if scale == 1 else np.maximum(self.size[visible] * scale, 1)
+        for x, y, size, alpha, color in zip(x[visible].tolist(), y[visible].tolist(), size.tolist(),
+                                            self.alpha[visible].tolist(), self.color[visible].tolist()):
+            screen.blit(sprites.get(color, int(size), alpha), (int(x - size - 2), int(y - size - 2)))
+
+# SimClock class - fixed-timestep accumulator that decouples the simulation from the frame rate.
+# Frames feed in elapsed wall time; whole steps are run off the accumulator and the remainder
+# is used to interpolate rendering between the last two steps.
+class SimClock:
+    def __init__(self, step_rate, max_steps=MAX_SIM_STEPS):
+        self.step_rate = step_rate
+        self.max_steps = max_steps
+        self.accumulator = 0.0
+        self.time_ms = 0.0
+        self.steps = 0
+        self.dropped_steps = 0
+
+    @property
+    def step_ms(self):
+        return 1000 / self.step_rate
+
+    @property
+    def dt(self):
+        return 1 / self.step_rate
+
+    def set_rate(self, step_rate):
+        if step_rate != self.step_rate:
+            # Keep the same fraction of a step pending so interpolation doesn't jump
+            self.accumulator *= self.step_rate / step_rate
+            self.step_rate = step_rate
+
+    def advance(self, elapsed_ms):
+        # Returns how many steps to run this frame; under load the backlog beyond max_steps is dropped
+        # so a slow frame doesn't snowball into ever longer catch-up frames
+        self.accumulator += elapsed_ms
+        steps = int(self.accumulator // self.step_ms)
+        if steps > self.max_steps:
+            self.dropped_steps += steps - self.max_steps
+            self.accumulator -= (steps - self.max_steps) * self.step_ms
+            steps = self.max_steps
+        return steps
+
+    def step(self):
+        # Consume one step and return the simulation time it runs at
+        self.accumulator -= self.step_ms
+        self.time_ms += self.step_ms
+        self.steps += 1
+        return self.time_ms
+
+    @property
+    def blend(self):
+        return min(1.0, self.accumulator / self.step_ms)
+
+# Particle count below which ParallelSimulation steps its chunks in-process
+PARALLEL_MIN_PARTICLES = 20000
+
+# Module globals the simulation reads; sent to pool workers with every step
+SIMULATION_CONSTANTS = ('FADE_DURATION', 'ATTRACTION_STRENGTH', 'REPULSION_THRESHOLD', 'REPULSION_STRENGTH')
+
+def simulation_constants():
+    return tuple(globals()[name] for name in SIMULATION_CONSTANTS)
+
+# Random stream for one chunk of a parallel star field, derived from the pool seed and chunk index
+def chunk_rng(entropy, chunk):
+    return np.random.default_rng(np.random.SeedSequence(entropy, spawn_key=(chunk,)))
+
+def shared_star_arrays(blocks, count):
+    return (np.ndarray((len(StarField.FLOAT_FIELDS), count), dtype=np.float64, buffer=blocks[0].buf),
+            np.ndarray((len(StarField.INT_FIELDS), count), dtype=np.int32, buffer=blocks[1].buf))
+
+# Worker process loop for ParallelSimulation. Worker k owns chunks k, k + workers, k + 2 * workers, ...
+# and keeps their random streams, so results only depend on the seed and chunk size.
+def _simulation_worker(conn, worker_index, worker_count, chunk_size, entropy):
+    blocks = []
+    chunks = []
+    rngs = {}
+    while True:
+        command, payload = conn.recv()
+        if command == 'step':
+            constants, args = payload
+            globals().update(zip(SIMULATION_CONSTANTS, constants))
+            for field in chunks:
+                field.update(*args)
+            conn.send(None)
+        elif command == 'attach':
+            names, count, ranges = payload
+            chunks = []
+            for block in blocks:
+                block.close()
+            blocks = [shared_memory.SharedMemory(name=name) for name in names]
+            floats, ints = shared_star_arrays(blocks, count)
+            for chunk in range(worker_index, -(-count // chunk_size), worker_count):
+                if chunk not in rngs:
+                    rngs[chunk] = chunk_rng(entropy, chunk)
+                lo, hi = chunk * chunk_size, min(count, (chunk + 1) * chunk_size)
+                chunks.append(StarField.view(floats[:, lo:hi], ints[:, lo:hi], rngs[chunk], *ranges))
+            del floats, ints
+            conn.send(None)
+        elif command == 'get_states':
+            conn.send({chunk: rng.bit_generator.state for chunk, rng in rngs.items()})
+        elif command == 'set_states':
+            for chunk, state in payload.items():
+                rngs.setdefault(chunk, chunk_rng(entropy, chunk)).bit_generator.state = state
+            conn.send(None)
+        elif command == 'stop':
+            break
+    chunks = []
+    for block in blocks:
+        block.close()
+
+# ParallelSimulation class - steps a StarField on a persistent worker pool.
+# The field's blocks live in shared memory and are split into chunk_size index ranges; each step
+# only a small parameter tuple crosses the pipes. Small fields are stepped chunk by chunk in-process
+# with the same per-chunk random streams, so a seeded run gives the same result either way.
+class ParallelSimulation:
+    def __init__(self, stars, workers, chunk_size=8192, seed=None, min_particles=PARALLEL_MIN_PARTICLES):
+        self.stars = stars
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.min_particles = min_particles
+        self.entropy = np.random.SeedSequence(seed).entropy
+        self.rngs = {}
+        self.rngs_in_workers = False
+        self.blocks = []
+        self.stale_blocks = []
+        self.attached_blocks = None
+        self.chunks = None
+        self.connections = []
+        self.processes = []
+        stars.set_allocator(self.allocate)
+
+    def __len__(self):
+        return len(self.stars)
+
+    def allocate(self, count):
+        self.chunks = None
+        self.stale_blocks += self.blocks
+        self.blocks = [shared_memory.SharedMemory(create=True, size=max(1, len(StarField.FLOAT_FIELDS) * count * 8)),
+                       shared_memory.SharedMemory(create=True, size=max(1, len(StarField.INT_FIELDS) * count * 4))]
+        return shared_star_arrays(self.blocks, count)
+
+    def start(self):
+        if self.processes:
+            return
+        os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+        context = multiprocessing.get_context('spawn')
+        for worker_index in range(self.workers):
+            parent_conn, child_conn = context.Pipe()
+            process = context.Process(target=_simulation_worker, daemon=True,
+                                      args=(child_conn, worker_index, self.workers, self.chunk_size, self.entropy))
+            process.start()
+            self.connections.append(parent_conn)
+            self.processes.append(process)
+
+    def broadcast(self, command, payloads=None):
+        for i, conn in enumerate(self.connections):
+            conn.send((command, payloads[i] if payloads is not None else None))
+        return [conn.recv() for conn in self.connections]
+
+    def update(self, attractors, screen_width, screen_height, time_ms, dt):
+        args = (attractors, screen_width, screen_height, time_ms, dt)
+        if self.workers > 1 and len(self.stars) >= self.min_particles:
+            self.start()
+            if self.attached_blocks is not self.blocks:
+                ranges = (self.stars.size_range, self.stars.pulse_range)
+                self.broadcast('attach', [([block.name for block in self.blocks], len(self.stars), ranges)] * self.workers)
+                self.attached_blocks = self.blocks
+            if not self.rngs_in_workers:
+                states = [{} for _ in range(self.workers)]
+                for chunk, rng in self.rngs.items():
+                    states[chunk % self.workers][chunk] = rng.bit_generator.state
+                self.broadcast('set_states', states)
+                self.rngs_in_workers = True
+            self.broadcast('step', [(simulation_constants(), args)] * self.workers)
+        else:
+            if self.rngs_in_workers:
+                for states in self.broadcast('get_states'):
+                    for chunk, state in states.items():
+                        self.rngs.setdefault(chunk, chunk_rng(self.entropy, chunk)).bit_generator.state = state
+                self.rngs_in_workers = False
+            for field in self.local_chunks():
+                field.update(*args)
+        self.release_stale_blocks()
+
+        # Neighbour forces need the whole field, so they run here after the chunks have stepped
+        if self.stars.flocking:
+            self.stars.apply_neighbor_forces(dt * MOTION_REFERENCE_RATE)
+            self.stars.wrap(screen_width, screen_height)
+
+    def local_chunks(self):
+        if self.chunks is None:
+            count = len(self.stars)
+            self.chunks = []
+            for chunk in range(-(-count // self.chunk_size)):
+                if chunk not in self.rngs:
+                    self.rngs[chunk] = chunk_rng(self.entropy, chunk)
+                lo, hi = chunk * self.chunk_size, min(count, (chunk + 1) * self.chunk_size)
+                self.chunks.append(StarField.view(self.stars.floats[:, lo:hi], self.stars.ints[:, lo:hi], self.rngs[chunk],
+                                                  self.stars.size_range, self.stars.pulse_range))
+        return self.chunks
+
+    def release_stale_blocks(self):
+        # Blocks replaced by a resize; workers still attached to them just keep a mapping until they re-attach
+        for block in self.stale_blocks:
+            block.close()
+            block.unlink()
+        self.stale_blocks = []
+
+    def close(self):
+        if self.processes:
+            for conn in self.connections:
+                conn.send(('stop', None))
+            for process in self.processes:
+                process.join(timeout=1)
+            self.connections, self.processes = [], []
+        self.stars.set_allocator(allocate_star_arrays)
+        self.chunks = None
+        self.stale_blocks += self.blocks
+        self.blocks = []
+        self.release_stale_blocks()
+
+# Star render modes, selectable at runtime with the B key
+RENDER_MODES = ['batched', 'per_star']
+
+# StarRenderer class - draws a whole StarField per frame.
+# 'batched' blends radius 1-2 stars straight into the frame's pixel array and sends
+# larger stars through a single Surface.blits() call; 'per_star' blits one sprite at a time.
+class StarRenderer:
+    SMALL_RADIUS = 2
+
+    def __init__(self, sprites, mode='batched'):
+        self.sprites = sprites
+        self.mode = mode
+        self.stamps = {}
+        self.sprite_share = 1.0  # fraction of the last frame's stars drawn from the sprite cache
+
+    def cycle_mode(self):
+        self.mode = RENDER_MODES[(RENDER_MODES.index(self.mode) + 1) % len(RENDER_MODES)]
+
+    def stamp(self, radius):
+        # Pixel offsets covered by pygame.draw.circle, relative to the sprite's top-left corner
+        if radius not in self.stamps:
+            surface = pygame.Surface((radius*2 + 4, radius*2 + 4), pygame.SRCALPHA)
+            pygame.draw.circle(surface, (255, 255, 255, 255), (radius + 2, radius + 2), radius)
+            self.stamps[radius] = np.nonzero(pygame.surfarray.array_alpha(surface))
+        return self.stamps[radius]
+
+    def draw(self, screen, stars, blend=1.0, scale=1.0):
+        # scale maps simulation (window) coordinates onto a reduced-size render target
+        if self.mode == 'per_star' or screen.get_bitsize() not in (24, 32):
+            self.sprite_share = 1.0
+            stars.draw(screen, self.sprites, blend, scale)
+            return
+
+        x, y = stars.positions(blend, scale)
+        visible = np.flatnonzero(stars.alpha > 0)
+        size = stars.size[visible] if scale == 1 else np.maximum(stars.size[visible] * scale, 1)
+        radius = size.astype(int)
+        left = (x[visible] - size - 2).astype(int)
+        top = (y[visible] - size - 2).astype(int)
+
+        small = radius <= self.SMALL_RADIUS
+        self.sprite_share = 1 - small.mean() if len(small) else 1.0
+        if small.any():
+            self.blend_small(screen, stars, visible[small], radius[small], left[small], top[small])
+
+        large = ~small
+        get = self.sprites.get
+        screen.blits([(get(color, r, alpha), (x, y)) for color, r, alpha, x, y in
+                      zip(stars.color[visible[large]].tolist(), radius[large].tolist(), stars.alpha[visible[large]].tolist(),
+                          left[large].tolist(), top[large].tolist())], doreturn=False)
+
+    def blend_small(self, screen, stars, idx, radius, left, top):
+        width, height = screen.get_size()
+        pixels = pygame.surfarray.pixels3d(screen)
+        for r in range(1, self.SMALL_RADIUS + 1):
+            group = radius == r
+            if not group.any():
+                continue
+            color = stars.colors[stars.color[idx[group]]].astype(np.int32)
+            alpha = stars.alpha[idx[group]].astype(np.int32)[:, None]
+            for ox, oy in zip(*self.stamp(r)):
+                px = left[group] + ox
+                py = top[group] + oy
+                inside = (px >= 0) & (px < width) & (py >= 0) & (py < height)
+                px, py = px[inside], py[inside]
+                dst = pixels[px, py].astype(np.int32)
+                pixels[px, py] = dst + (color[inside] - dst) * alpha[inside] // 255
+        del pixels
+
+# TrailRenderer class - motion trails from one persistent accumulation surface. Each frame it is faded by a
+# full-surface multiply blit, the stars are drawn into it once and it is added over the scene, so a frame
+# costs the same however long the trails are.
+class TrailRenderer:
+    def __init__(self):
+        self.surface = None
+        self.fade = None
+        self.floor = None
+        self.keep = None
+
+    def reset(self):
+        self.surface = None
+
+    def resize(self, scene):
+        # Same pixel format as the scene; blended fills have no fast path, so the fade factors are solid
+        # surfaces blitted with the blend flags instead
+        size = scene.get_size()
+        self.surface = pygame.Surface(size, 0, scene)
+        self.surface.fill((0, 0, 0))
+        if self.fade is None or self.fade.get_size() != size:
+            self.fade = pygame.Surface(size, 0, scene)
+            self.floor = pygame.Surface(size, 0, scene)
+            self.floor.fill((1, 1, 1))
+            self.keep = None
+
+    def draw(self, scene, stars, renderer, blend=1.0, scale=1.0, decay=TRAIL_DECAY, frame_ms=1000 / MOTION_REFERENCE_RATE):
+        if self.surface is None or self.surface.get_size() != scene.get_size():
+            self.resize(scene)
+        # decay is tuned per 1/60 s
+        keep = int(255 * (1 - decay) ** (frame_ms * MOTION_REFERENCE_RATE / 1000))
+        if keep != self.keep:
+            self.keep = keep
+            self.fade.fill((keep, keep, keep))
+        self.surface.blit(self.fade, (0, 0), special_flags=pygame.BLEND_RGB_MULT)
+        # The multiply rounds up, which would leave faint trails stuck just above black
+        self.surface.blit(self.floor, (0, 0), special_flags=pygame.BLEND_RGB_SUB)
+        renderer.draw(self.surface, stars, blend, scale)
+        scene.blit(self.surface, (0, 0), special_flags=pygame.BLEND_RGB_ADD)
+
+# Depth layers behind the main field in parallax mode, farthest first: stars per main-field star, frames between
+# updates, largest base size (up to 2 keeps them on the batched small-star path), brightness, share of the
+# attractors' pull and how far the layer shifts as the mouse moves off-centre
+PARALLAX_LAYERS = [
+    {'density': 4.0, 'interval': 6, 'size': 1, 'brightness': 0.35, 'reactivity': 0.0, 'shift': 0.01},
+    {'density': 2.0, 'interval': 3, 'size': 2, 'brightness': 0.6, 'reactivity': 0.25, 'shift': 0.03}
+]
+
+class ParallaxLayer:
+    def __init__(self, sprites, density, interval, size, brightness, reactivity, shift, seed=None):
+        self.density = density
+        self.interval = interval
+        self.reactivity = reactivity
+        self.shift = shift
+        self.stars = StarField(0, 1, 1, seed=seed, size_range=(1, size), pulse_range=(0.0, 0.5))
+        self.stars.colors = (self.stars.colors * brightness).astype(np.uint8)
+        self.renderer = StarRenderer(sprites)
+        self.surface = None
+        self.elapsed = 0.0
+        self.countdown = 1
+        self.changed = True
+
+# ParallaxLayers class - dense, dim far layers drawn behind the main (near) field. Each layer is its own
+# StarField, updated every `interval` frames with the time that built up since, on staggered frames so the
+# layers don't all land on one. A layer is rendered into its cached surface only after it updates; every
+# other frame just adds that surface over the background, offset for parallax.
+class ParallaxLayers:
+    def __init__(self, sprites, layers=PARALLAX_LAYERS, seed=None):
+        self.layers = [ParallaxLayer(sprites, seed=None if seed is None else seed + 1 + i, **layer) for i, layer in enumerate(layers)]
+        for i, layer in enumerate(self.layers):
+            layer.countdown = 1 + i % layer.interval
+
+    def __len__(self):
+        return sum(len(layer.stars) for layer in self.layers)
+
+    def resize(self, count, screen_width, screen_height):
+        for layer in self.layers:
+            layer.stars.resize(max(1, int(count * layer.density)), screen_width, screen_height)
+
+    def update(self, seconds, attractors, screen_width, screen_height, time_ms):
+        attractors = np.asarray(attractors, dtype=np.float64).reshape(-1, len(ATTRACTOR_FIELDS))
+        for layer in self.layers:
+            layer.elapsed += seconds
+            layer.countdown -= 1
+            if layer.countdown > 0 or layer.elapsed <= 0:
+                continue
+            layer.countdown = layer.interval
+            # Far layers feel a fraction of the pull, or none (an empty source list skips the force math)
+            sources = attractors * (1, 1, layer.reactivity, 1, layer.reactivity) if layer.reactivity else attractors[:0]
+            layer.stars.update(sources, screen_width, screen_height, time_ms, layer.elapsed)
+            layer.elapsed = 0.0
+            layer.changed = True
+
+    def draw(self, scene, mouse, screen_size, scale=1.0):
+        width, height = scene.get_size()
+        for layer in self.layers:
+            if layer.surface is None or layer.surface.get_size() != (width, height):
+                layer.surface = pygame.Surface((width, height), 0, scene)
+                layer.changed = True
+            if layer.changed:
+                layer.surface.fill((0, 0, 0))
+                layer.renderer.draw(layer.surface, layer.stars, 1.0, scale)
+                layer.changed = False
+            # Added rather than alpha-blended so the black around the stars leaves the background alone;
+            # the layer wraps around the edges as it shifts
+            ox = int((screen_size[0] / 2 - mouse[0]) * layer.shift * scale) % width
+            oy = int((screen_size[1] / 2 - mouse[1]) * layer.shift * scale) % height
+            scene.blits([(layer.surface, (x, y), None, pygame.BLEND_RGB_ADD) for x in (ox, ox - width) for y in (oy, oy - height)
+                         if x < width and y < height], doreturn=False)
+
+# DirtyRectRenderer class - restores and presents only the screen tiles that stars (and the menu)
+# covered this frame or the last one. Falls back to a full blit + flip when the scene changes or
+# too much of the screen is dirty for the partial update to pay off.
+class DirtyRectRenderer:
+    def __init__(self, tile_size=16, max_dirty_fraction=0.4):
+        self.enabled = False
+        self.tile_size = tile_size
+        self.max_dirty_fraction = max_dirty_fraction
+        self.tiles = None
+        self.scene = None
+        self.dirty_fraction = 1.0
+        self.full_frames = 0
+        self.partial_frames = 0
+
+    def mark_boxes(self, tiles, left, top, width, height):
+        # Set every tile overlapped by the boxes (arrays of screen-space left/top/width/height)
+        rows, columns = tiles.shape
+        tile = self.tile_size
+        tx0 = np.clip(left // tile, 0, columns - 1)
+        ty0 = np.clip(top // tile, 0, rows - 1)
+        tx1 = np.clip((left + width - 1) // tile, 0, columns - 1)
+        ty1 = np.clip((top + height - 1) // tile, 0, rows - 1)
+        for dy in range(int((ty1 - ty0).max(initial=0)) + 1):
+            ty = np.minimum(ty0 + dy, ty1)
+            for dx in range(int((tx1 - tx0).max(initial=0)) + 1):
+                tiles[ty, np.minimum(tx0 + dx, tx1)] = True
+
+    def current_tiles(self, screen, stars, blend, regions):
+        tile = self.tile_size
+        width, height = screen.get_size()
+        tiles = np.zeros((-(-height // tile), -(-width // tile)), dtype=bool)
+        if stars is not None:
+            # Same boxes the renderers draw into: sprite of radius int(size) with a 2px margin
+            x, y = stars.positions(blend)
+            visible = np.flatnonzero(stars.alpha > 0)
+            size = stars.size[visible]
+            box = size.astype(int) * 2 + 4
+            self.mark_boxes(tiles, (x[visible] - size - 2).astype(int), (y[visible] - size - 2).astype(int), box, box)
+        if regions:
+            boxes = np.array([tuple(rect) for rect in regions])
+            self.mark_boxes(tiles, boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3])
+        return tiles
+
+    def tile_rects(self, tiles):
+        # One rect per horizontal run of dirty tiles
+        tile = self.tile_size
+        padded = np.zeros((tiles.shape[0], tiles.shape[1] + 2), dtype=np.int8)
+        padded[:, 1:-1] = tiles
+        edges = np.diff(padded, axis=1)
+        starts = np.argwhere(edges == 1)
+        ends = np.argwhere(edges == -1)
+        return [(x0 * tile, row * tile, (x1 - x0) * tile, tile) for (row, x0), x1 in zip(starts.tolist(), ends[:, 1].tolist())]
+
+    def restore(self, screen, background, stars, blend, regions=(), scene=None, force_full=False):
+        # Puts the background back where needed; returns the rects to present, or None for a full flip
+        if not self.enabled:
+            self.tiles = None
+            screen.blit(background, (0, 0))
+            return None
+
+        tiles = self.current_tiles(screen, stars, blend, regions)
+        previous, self.tiles = self.tiles, tiles
+        full = force_full or scene != self.scene or previous is None or previous.shape != tiles.shape
+        self.scene = scene
+        if not full:
+            dirty = tiles | previous
+            self.dirty_fraction = dirty.mean()
+            full = self.dirty_fraction > self.max_dirty_fraction
+        if full:
+            self.dirty_fraction = 1.0
+            self.full_frames += 1
+            screen.blit(background, (0, 0))
+            return None
+
+        self.partial_frames += 1
+        rects = self.tile_rects(dirty)
+        screen.blits([(background, rect, rect) for rect in rects], doreturn=False)
+        return rects
+
+    def present(self, rects):
+        if rects is None:
+            pygame.display.flip()
+        else:
+            pygame.display.update(rects)
+
+# QualityGovernor class - holds the frame time under the FPS slider's budget by trading quality.
+# Work time per frame (clock.get_rawtime, i.e. without the tick delay) is smoothed; above
+# high * budget it steps quality down, below low * budget it steps back up. The gap between the
+# two thresholds plus a cooldown after every change keeps it from oscillating.
+# Degrades particle count first, then sprite alpha levels, then simulation rate; restores in reverse.
+# Alpha levels only affect stars drawn from the sprite cache, so that step is skipped while most stars
+# take the batched renderer's small-star path.
+class QualityGovernor:
+    PARTICLE_STEP = 0.85
+    MIN_PARTICLE_SCALE = 0.25
+    MIN_SPRITE_SHARE = 0.5
+    ALPHA_LEVELS = [32, 16, 8]
+    SIM_SCALES = [1.0, 0.75, 0.5]
+
+    def __init__(self, enabled=False, particle_scale=1.0, alpha_levels=32, sim_scale=1.0, low=0.7, high=0.95, cooldown=30):
+        self.enabled = enabled
+        self.particle_scale = min(1.0, max(self.MIN_PARTICLE_SCALE, particle_scale))
+        self.alpha_levels = alpha_levels if alpha_levels in self.ALPHA_LEVELS else self.ALPHA_LEVELS[0]
+        self.sim_scale = sim_scale if sim_scale in self.SIM_SCALES else self.SIM_SCALES[0]
+        self.low = low
+        self.high = high
+        self.cooldown_frames = cooldown
+        self.cooldown = cooldown
+        self.frame_ms = None
+        self.sprite_share = 1.0
+        self.last_decision = ""
+        # Saved levels only carry over while the governor is on; otherwise start at full quality
+        self.set_enabled(enabled)
+
+    def set_enabled(self, enabled):
+        self.enabled = enabled
+        self.frame_ms = None
+        self.cooldown = self.cooldown_frames
+        if not enabled:
+            # Configured quality applies as-is while the governor is off
+            self.particle_scale = 1.0
+            self.alpha_levels = self.ALPHA_LEVELS[0]
+            self.sim_scale = self.SIM_SCALES[0]
+            self.last_decision = ""
+
+    def update(self, work_ms, target_fps, sprite_share=1.0):
+        # sprite_share: fraction of the drawn stars that came from the sprite cache
+        if not self.enabled:
+            return
+        self.sprite_share = sprite_share
+        self.frame_ms = work_ms if self.frame_ms is None else self.frame_ms * 0.9 + work_ms * 0.1
+        if self.cooldown > 0:
+            self.cooldown -= 1
+            return
+        budget = 1000 / max(1, target_fps)
+        if self.frame_ms > budget * self.high:
+            changed = self.degrade()
+        elif self.frame_ms < budget * self.low:
+            changed = self.upgrade()
+        else:
+            changed = False
+        if changed:
+            self.cooldown = self.cooldown_frames
+
+    def degrade(self):
+        if self.particle_scale > self.MIN_PARTICLE_SCALE:
+            self.particle_scale = max(self.MIN_PARTICLE_SCALE, self.particle_scale * self.PARTICLE_STEP)
+            self.last_decision = "fewer particles"
+        elif self.alpha_levels != self.ALPHA_LEVELS[-1] and self.sprite_share >= self.MIN_SPRITE_SHARE:
+            self.alpha_levels = self.ALPHA_LEVELS[self.ALPHA_LEVELS.index(self.alpha_levels) + 1]
+            self.last_decision = "coarser sprites"
+        elif self.sim_scale != self.SIM_SCALES[-1]:
+            self.sim_scale = self.SIM_SCALES[self.SIM_SCALES.index(self.sim_scale) + 1]
+            self.last_decision = "slower simulation"
+        else:
+            return False
+        return True
+
+    def upgrade(self):
+        if self.sim_scale != self.SIM_SCALES[0]:
+            self.sim_scale = self.SIM_SCALES[self.SIM_SCALES.index(self.sim_scale) - 1]
+            self.last_decision = "faster simulation"
+        elif self.alpha_levels != self.ALPHA_LEVELS[0]:
+            self.alpha_levels = self.ALPHA_LEVELS[self.ALPHA_LEVELS.index(self.alpha_levels) - 1]
+            self.last_decision = "finer sprites"
+        elif self.particle_scale < 1.0:
+            self.particle_scale = min(1.0, self.particle_scale / self.PARTICLE_STEP)
+            self.last_decision = "more particles"
+        else:
+            return False
+        return True
+
+    def status(self):
+        if not self.enabled:
+            return "Press G to enable quality governor"
+        return f"Governor: {self.particle_scale:.0%} stars, {self.alpha_levels} alpha, {self.sim_scale:.0%} sim"
+
+# Accepted config.json settings: ('int' | 'number', min, max), ('bool',), ('choice', options) or ('wells',)
+# Defined after QualityGovernor so the governor settings can be checked against its levels
+CONFIG_SCHEMA = {
+    'width': ('int', 1, 16384),
+    'height': ('int', 1, 16384),
+    'fps': ('number', 1, 1000),
+    'attraction_strength': ('number', 0, 1),
+    'repulsion_threshold': ('number', 20, 10000),
+    'repulsion_strength': ('number', 0, 10),
+    'fade_duration': ('number', 1, 3600),
+    'num_particles': ('int', 1, 10000000),
+    'particle_size': ('int', 1, 100),
+    'pulse_amplitude': ('number', 0, 100),
+    'pulse_speed': ('number', 0, 10),
+    'sim_rate': ('number', 1, 1000),
+    'dirty_rects': ('bool',),
+    'render_scale': ('choice', RENDER_SCALES),
+    'render_scale_smooth': ('bool',),
+    'trails': ('bool',),
+    'trail_decay': ('number', 0, 1),
+    'parallax': ('bool',),
+    'gravity_wells_enabled': ('bool',),
+    'gravity_wells': ('wells',),
+    'governor': ('bool',),
+    'governor_particle_scale': ('number', QualityGovernor.MIN_PARTICLE_SCALE, 1),
+    'governor_alpha_levels': ('choice', QualityGovernor.ALPHA_LEVELS),
+    'governor_sim_scale': ('choice', QualityGovernor.SIM_SCALES),
+    'idle_timeout': ('number', 0, 1e9),
+    'ambient_fps': ('number', 1, 1000),
+    'ambient_sim_rate': ('number', 1, 1000)
+}
+GRAVITY_WELL_SETTINGS = ('attraction_strength', 'repulsion_threshold', 'repulsion_strength', 'period_x', 'period_y', 'phase', 'extent')
+
+def is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+
+def check_setting(rule, value):
+    # Returns what is wrong with value, or None
+    kind = rule[0]
+    if kind == 'bool':
+        return None if isinstance(value, bool) else "must be true or false"
+    if kind == 'choice':
+        return None if is_number(value) and value in rule[1] else f"must be one of {', '.join(map(str, rule[1]))}"
+    if kind == 'wells':
+        if not isinstance(value, list) or not all(isinstance(well, dict) for well in value):
+            return "must be a list of objects"
+        for well in value:
+            for key, setting in well.items():
+                if key not in GRAVITY_WELL_SETTINGS:
+                    return f"has unknown well setting '{key}'"
+                if not is_number(setting) or (key.startswith('period') and setting == 0):
+                    return f"has an invalid {key}"
+        return None
+    low, high = rule[1], rule[2]
+    if not is_number(value) or (kind == 'int' and not isinstance(value, int)):
+        return f"must be {'an integer' if kind == 'int' else 'a number'}"
+    if not low <= value <= high:
+        return f"must be between {low} and {high}"
+    return None
+
+def validate_config(config):
+    # Splits a parsed config into the settings that pass CONFIG_SCHEMA and messages about the rest
+    if not isinstance(config, dict):
+        return {}, ["expected a JSON object"]
+    valid, errors = {}, []
+    for key, value in config.items():
+        if key not in CONFIG_SCHEMA:
+            errors.append(f"unknown setting '{key}'")
+            continue
+        error = check_setting(CONFIG_SCHEMA[key], value)
+        if error:
+            errors.append(f"'{key}' {error}, ignoring {json.dumps(value)}")
+        else:
+            valid[key] = value
+    return valid, errors
+
+def read_config(path='config.json'):
+    # Raises OSError/ValueError when the file can't be read or parsed at all
+    with open(path, 'r') as f:
+        return validate_config(json.load(f))
+
+# ConfigWatcher class - polls config.json's mtime on a background thread. A changed file is parsed and
+# validated there; the main loop collects the settings that differ from the last good version with poll()
+# and applies them between frames.
+class ConfigWatcher:
+    def __init__(self, config, path='config.json', interval=1.0):
+        self.path = path
+        self.config = dict(config)  # settings as of the last reload; changes are reported against these
+        self.interval = interval
+        self.results = queue.Queue()
+        self.stopped = threading.Event()
+        self.mtime = self.stat()
+        self.thread = threading.Thread(target=self.run, name='config-watcher', daemon=True)
+        self.thread.start()
+
+    def stat(self):
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            mtime = self.stat()
+            if mtime is None or mtime == self.mtime:
+                continue
+            self.mtime = mtime
+            try:
+                config, errors = read_config(self.path)
+            except (OSError, ValueError) as e:
+                # Often an editor caught mid-save; the finished write changes the mtime again
+                self.results.put(({}, [str(e)]))
+                continue
+            changed = {key: value for key, value in config.items() if key not in self.config or self.config[key] != value}
+            self.config.update(config)
+            self.results.put((changed, errors))
+
+    def poll(self):
+        # Settings changed and error messages from every reload since the last call
+        changed, errors = {}, []
+        while True:
+            try:
+                reload_changed, reload_errors = self.results.get_nowait()
+            except queue.Empty:
+                return changed, errors
+            changed.update(reload_changed)
+            errors += reload_errors
+
+    def close(self):
+        self.stopped.set()
+
+# Power states, from full rate down to not rendering at all
+POWER_STATES = ['active', 'ambient', 'splash', 'hidden']
+INPUT_EVENTS = {pygame.KEYDOWN, pygame.KEYUP, pygame.MOUSEMOTION, pygame.MOUSEBUTTONDOWN, pygame.MOUSEBUTTONUP,
+                pygame.MOUSEWHEEL, pygame.FINGERDOWN, pygame.FINGERUP, pygame.FINGERMOTION}
+
+# PowerScheduler class - picks how the main loop waits for its next frame.
+# 'active' ticks at the FPS slider rate. 'ambient' (idle or unfocused) and 'splash'/'hidden'
+# block in pygame.event.wait with a timeout instead, so any input wakes the loop at once
+# and the next frame is back at full rate.
+class PowerScheduler:
+    SPLASH_WAIT_MS = 500
+    HIDDEN_WAIT_MS = 500
+
+    def __init__(self, idle_timeout, ambient_fps, ambient_sim_rate):
+        self.idle_timeout = idle_timeout
+        self.ambient_fps = ambient_fps
+        self.ambient_sim_rate = ambient_sim_rate
+        self.state = 'active'  # first frame is drawn without waiting
+        self.last_input = time.monotonic()
+        self.hidden = False
+        self.focused = True
+        self.last_frame = 0.0
+        self.frames = 0
+        self.time_in_state = dict.fromkeys(POWER_STATES, 0.0)
+
+    def wait(self, clock, fps):
+        # Returns (elapsed ms since the last frame, pending events)
+        if self.state == 'active':
+            # tick(fps) would hold the first frame back by a frame period counted from the Clock's creation
+            frame_ms = clock.tick(fps if self.frames else 0)
+            events = pygame.event.get()
+        else:
+            if self.state == 'ambient':
+                # Sleep out whatever is left of the ambient frame interval
+                timeout = int(1000 / self.ambient_fps - (time.monotonic() - self.last_frame) * 1000)
+            elif self.state == 'hidden':
+                timeout = self.HIDDEN_WAIT_MS
+            else:
+                timeout = self.SPLASH_WAIT_MS
+            # event.wait(0) blocks forever, so poll once the interval has already run out
+            first = pygame.event.wait(timeout) if timeout > 0 else pygame.event.poll()
+            frame_ms = clock.tick()
+            events = pygame.event.get()
+            if first.type != pygame.NOEVENT:
+                events.insert(0, first)
+        self.last_frame = time.monotonic()
+        self.frames += 1
+        self.time_in_state[self.state] += frame_ms / 1000
+        return frame_ms, events
+
+    def observe(self, events, startup):
+        now = time.monotonic()
+        for event in events:
+            if event.type in INPUT_EVENTS:
+                self.last_input = now
+            elif event.type in (pygame.WINDOWMINIMIZED, pygame.WINDOWHIDDEN):
+                self.hidden = True
+            elif event.type in (pygame.WINDOWRESTORED, pygame.WINDOWSHOWN, pygame.WINDOWEXPOSED, pygame.WINDOWMAXIMIZED):
+                self.hidden = False
+            elif event.type == pygame.WINDOWFOCUSLOST:
+                self.focused = False
+            elif event.type == pygame.WINDOWFOCUSGAINED:
+                self.focused = True
+
+        if self.hidden:
+            self.state = 'hidden'
+        elif startup:
+            self.state = 'splash'
+        elif not self.focused or (self.idle_timeout > 0 and now - self.last_input > self.idle_timeout):
+            self.state = 'ambient'
+        else:
+            self.state = 'active'
+
+    def sim_rate(self, rate):
+        if self.state == 'ambient':
+            return min(rate, self.ambient_sim_rate)
+        return rate
+
+    def report(self):
+        total = sum(self.time_in_state.values()) or 1
+        return "Power states: " + ", ".join(f"{state} {seconds:.1f}s ({seconds / total:.0%})" for state, seconds in self.time_in_state.items())
+
+# Frame profiler phases, in the order they are shown in the overlay
+PROFILE_PHASES = ['events', 'menu', 'update', 'draw', 'background', 'overlay', 'flip']
+PHASE_EVENTS, PHASE_MENU, PHASE_UPDATE, PHASE_DRAW, PHASE_BACKGROUND, PHASE_OVERLAY, PHASE_FLIP = range(len(PROFILE_PHASES))
+PHASE_COLORS = [(230, 120, 120), (230, 200, 120), (150, 230, 120), (120, 200, 230), (150, 150, 230), (200, 150, 230), (230, 230, 230)]
+
+# FrameProfiler class - per-phase frame timings for the overlay (toggled with P) and the optional CSV ring buffer.
+# mark(phase) charges the time since the previous mark to that phase; when neither the overlay nor
+# the CSV recorder is on, every call returns after a single attribute check.
+class FrameProfiler:
+    def __init__(self, history=240, csv_path=None, csv_rows=3600, collect=False):
+        self.enabled = False
+        self.recording = csv_path is not None
+        # collect keeps the phase timings running for the metrics endpoint
+        self.collect = collect
+        self.active = self.recording or collect
+        self.csv_path = csv_path
+        self.phases = np.zeros(len(PROFILE_PHASES))
+        self.last_mark = 0.0
+        self.frame = 0
+
+        # Overlay history (ring buffers)
+        self.history = history
+        self.frame_times = np.zeros(history)
+        self.phase_history = np.zeros((history, len(PROFILE_PHASES)))
+        self.history_index = 0
+
+        # CSV samples: frame, wall time, frame interval, target fps, achieved fps, particles, phases...
+        self.csv_rows = np.zeros((csv_rows, 6 + len(PROFILE_PHASES)))
+        self.csv_index = 0
+
+    def toggle(self):
+        self.enabled = not self.enabled
+        self.active = self.enabled or self.recording or self.collect
+
+    def begin_frame(self):
+        if not self.active:
+            return
+        self.phases[:] = 0
+        self.last_mark = time.perf_counter()
+
+    def mark(self, phase):
+        if not self.active:
+            return
+        now = time.perf_counter()
+        self.phases[phase] += now - self.last_mark
+        self.last_mark = now
+
+    def end_frame(self, frame_ms, target_fps, achieved_fps, particles):
+        self.frame += 1
+        if not self.active:
+            return
+        i = self.history_index
+        self.frame_times[i] = frame_ms
+        self.phase_history[i] = self.phases * 1000
+        self.history_index = (i + 1) % self.history
+        if self.recording:
+            row = self.csv_rows[self.csv_index % len(self.csv_rows)]
+            row[:6] = (self.frame, time.time() * 1000, frame_ms, target_fps, achieved_fps, particles)
+            row[6:] = self.phases * 1000
+            self.csv_index += 1
+
+    def write_csv(self):
+        if not self.recording or self.csv_index == 0:
+            return
+        # Oldest sample first
+        size = len(self.csv_rows)
+        if self.csv_index > size:
+            start = self.csv_index % size
+            rows = np.concatenate((self.csv_rows[start:], self.csv_rows[:start]))
+        else:
+            rows = self.csv_rows[:self.csv_index]
+        with open(self.csv_path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['frame', 'wall_ms', 'frame_ms', 'target_fps', 'achieved_fps', 'particles'] + [f"{phase}_ms" for phase in PROFILE_PHASES])
+            for row in rows.tolist():
+                frame, wall_ms, frame_ms, target_fps, achieved_fps, particles = row[:6]
+                writer.writerow([int(frame), f"{wall_ms:.3f}", f"{frame_ms:.3f}", int(target_fps), f"{achieved_fps:.2f}", int(particles)] +
+                                [f"{ms:.3f}" for ms in row[6:]])
+
+    def draw(self, screen, font, target_fps, achieved_fps, particles, cache_stats, power):
+        graph_width, graph_height = self.history, 80
+        panel = pygame.Surface((graph_width + 40, graph_height + 270))
+        panel.set_alpha(200)
+        panel.fill((0, 0, 0))
+        screen.blit(panel, (10, 10))
+
+        # Frame-time graph, newest sample on the right, budget line at the target frame time
+        budget = 1000 / max(1, target_fps)
+        scale = graph_height / max(budget * 2, self.frame_times.max(), 1)
+        times = np.roll(self.frame_times, -self.history_index)
+        points = [(20 + i, 20 + graph_height - min(graph_height, t * scale)) for i, t in enumerate(times.tolist())]
+        pygame.draw.lines(screen, (150, 230, 120), False, points)
+        budget_y = 20 + graph_height - budget * scale
+        pygame.draw.line(screen, (230, 120, 120), (20, budget_y), (20 + graph_width, budget_y))
+
+        # Averages over the last second of samples
+        recent = np.roll(self.phase_history, -self.history_index, axis=0)[-60:]
+        averages = recent.mean(axis=0).tolist()
+        lines = [
+            (f"FPS {achieved_fps:.1f} / {target_fps} (gap {target_fps - achieved_fps:+.1f})", None, WHITE),
+            (f"Frame {self.frame_times[self.history_index - 1]:.2f} ms, budget {budget:.2f} ms", None, WHITE),
+            (f"Particles {particles}", None, WHITE)
+        ]
+        lines += [(phase, f"{ms:6.2f} ms", color) for phase, ms, color in zip(PROFILE_PHASES, averages, PHASE_COLORS)]
+        lines.append((f"Sprites {cache_stats['entries']}/{cache_stats['max_entries']} hit {cache_stats['hit_rate']:.1%} miss {cache_stats['misses']}", None, WHITE))
+        lines.append((f"Power {power.state}, " + " ".join(f"{state[0]}:{seconds:.0f}s" for state, seconds in power.time_in_state.items()), None, WHITE))
+        y = 30 + graph_height
+        for text, value, color in lines:
+            screen.blit(font.render(text, True, color), (20, y))
+            if value is not None:
+                screen.blit(font.render(value, True, color), (130, y))
+            y += 20
+
+# Frame-time histogram bucket bounds for the metrics endpoint, in seconds
+METRICS_BUCKETS = [0.005, 0.010, 0.0167, 0.020, 0.025, 0.0334, 0.050, 0.100, 0.250, 1.0]
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path not in ('/', '/metrics'):
+            self.send_error(404)
+            return
+        body = self.server.exporter.render().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+class UnixHTTPServer(socketserver.UnixStreamServer):
+    def get_request(self):
+        # BaseHTTPRequestHandler expects a (host, port) client address
+        request, _ = super().get_request()
+        return request, ('local', 0)
+
+# MetricsExporter class - opt-in Prometheus text endpoint (--metrics-port / --metrics-socket) for unattended displays.
+# observe() only bumps counters and swaps in new gauge values from the main loop, which is their only writer;
+# the server thread reads whatever is there when scraped, so a slow or stuck scraper never blocks a frame.
+class MetricsExporter:
+    def __init__(self, port=None, socket_path=None):
+        self.bounds = np.array(METRICS_BUCKETS)
+        self.buckets = np.zeros(len(METRICS_BUCKETS) + 1, dtype=np.int64)  # last bucket is +Inf
+        self.frame_seconds = 0.0
+        self.phase_seconds = np.zeros(len(PROFILE_PHASES))
+        self.state = None
+
+        if socket_path:
+            if os.path.exists(socket_path):
+                os.unlink(socket_path)  # left behind by a crashed run
+            self.server = UnixHTTPServer(socket_path, MetricsHandler)
+            self.address = socket_path
+        else:
+            self.server = HTTPServer(('127.0.0.1', port), MetricsHandler)
+            self.address = f"http://127.0.0.1:{self.server.server_address[1]}/metrics"
+        self.socket_path = socket_path
+        self.server.exporter = self
+        self.thread = threading.Thread(target=self.server.serve_forever, name='metrics', daemon=True)
+        self.thread.start()
+
+    def observe(self, frame_ms, target_fps, achieved_fps, particles, phases, size, fullscreen, render_scale, power_state):
+        self.buckets[np.searchsorted(self.bounds, frame_ms / 1000)] += 1
+        self.frame_seconds += frame_ms / 1000
+        self.phase_seconds += phases
+        # One tuple assignment, so a scrape sees either the previous frame's gauges or this one's
+        self.state = (target_fps, achieved_fps, particles, size[0], size[1], int(fullscreen), render_scale, power_state)
+
+    def render(self):
+        buckets = np.cumsum(self.buckets)
+        phases = self.phase_seconds.copy()
+        lines = ["# HELP starfield_frame_seconds Interval between presented frames.",
+                 "# TYPE starfield_frame_seconds histogram"]
+        lines += [f'starfield_frame_seconds_bucket{{le="{bound}"}} {count}' for bound, count in zip(METRICS_BUCKETS, buckets.tolist())]
+        lines += [f'starfield_frame_seconds_bucket{{le="+Inf"}} {buckets[-1]}',
+                  f"starfield_frame_seconds_sum {self.frame_seconds:.6f}",
+                  f"starfield_frame_seconds_count {buckets[-1]}",
+                  "# HELP starfield_phase_seconds_total Time spent in each phase of the frame loop.",
+                  "# TYPE starfield_phase_seconds_total counter"]
+        lines += [f'starfield_phase_seconds_total{{phase="{phase}"}} {seconds:.6f}' for phase, seconds in zip(PROFILE_PHASES, phases.tolist())]
+        if self.state is not None:
+            target_fps, achieved_fps, particles, width, height, fullscreen, render_scale, power_state = self.state
+            for name, help_text, value in [
+                ('target_fps', "Frame rate set with the FPS slider.", target_fps),
+                ('fps', "Achieved frame rate.", f"{achieved_fps:.2f}"),
+                ('particles', "Active star count.", particles),
+                ('window_width_pixels', "Window width.", width),
+                ('window_height_pixels', "Window height.", height),
+                ('fullscreen', "1 when fullscreen.", fullscreen),
+                ('render_scale', "Fraction of the window resolution stars are rasterized at.", render_scale)
+            ]:
+                lines += [f"# HELP starfield_{name} {help_text}", f"# TYPE starfield_{name} gauge", f"starfield_{name} {value}"]
+            lines += ["# HELP starfield_power_state Current power state.", "# TYPE starfield_power_state gauge"]
+            lines += [f'starfield_power_state{{state="{state}"}} {int(state == power_state)}' for state in POWER_STATES]
+        return "\n".join(lines) + "\n"
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+        if self.socket_path and os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+# Star snapshot, written on exit and restored on the next start so the field carries on instead of fading in
+# from scratch: a header (magic, version, field layout, star count, screen size, CRC-32 of the data, simulation
+# time, which the pulse phase is computed from) followed by the float and int field blocks exactly as StarField holds them, so they can be mapped straight back in
+SNAPSHOT_PATH = 'starfield.snap'
+SNAPSHOT_MAGIC = b'CSSN'
+SNAPSHOT_VERSION = 2
+SNAPSHOT_HEADER = struct.Struct('<4sHxxIIIII4xd')  # 40 bytes, so the float block is aligned
+SNAPSHOT_LAYOUT = zlib.crc32(','.join(StarField.FLOAT_FIELDS + StarField.INT_FIELDS).encode())
+
+def save_snapshot(path, stars, screen_size, time_ms):
+    floats = np.ascontiguousarray(stars.floats).tobytes()
+    ints = np.ascontiguousarray(stars.ints, dtype=np.int32).tobytes()
+    crc = zlib.crc32(ints, zlib.crc32(floats))
+    # Written beside the old file and swapped in, so a crash mid-write leaves the previous snapshot
+    with open(path + '.tmp', 'wb') as f:
+        f.write(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, SNAPSHOT_LAYOUT, len(stars), screen_size[0], screen_size[1], crc, time_ms))
+        f.write(floats)
+        f.write(ints)
+    os.replace(path + '.tmp', path)
+
+def restore_snapshot(path, stars, screen_size):
+    # Loads a snapshot into stars; returns (simulation time in ms, None), or (None, reason) when it can't be
+    # used, and stars is left untouched
+    try:
+        with open(path, 'rb') as f:
+            header = f.read(SNAPSHOT_HEADER.size)
+            size = os.fstat(f.fileno()).st_size
+    except FileNotFoundError:
+        return None, "no snapshot"
+    if len(header) < SNAPSHOT_HEADER.size:
+        return None, "truncated header"
+    magic, version, layout, count, width, height, crc, time_ms = SNAPSHOT_HEADER.unpack(header)
+    if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION or layout != SNAPSHOT_LAYOUT:
+        return None, "unknown format"
+    if (width, height) != tuple(screen_size):
+        return None, f"saved at {width}x{height}"
+    float_shape, int_shape = (len(StarField.FLOAT_FIELDS), count), (len(StarField.INT_FIELDS), count)
+    float_bytes = float_shape[0] * count * 8
+    if count == 0 or size != SNAPSHOT_HEADER.size + float_bytes + int_shape[0] * count * 4:
+        return None, "wrong size"
+    floats = np.memmap(path, dtype=np.float64, mode='r', offset=SNAPSHOT_HEADER.size, shape=float_shape)
+    ints = np.memmap(path, dtype=np.int32, mode='r', offset=SNAPSHOT_HEADER.size + float_bytes, shape=int_shape)
+    if zlib.crc32(ints, zlib.crc32(floats)) != crc:
+        return None, "checksum mismatch"
+    if not math.isfinite(time_ms) or time_ms < 0 or not np.isfinite(floats).all() or ints.min(initial=0) < 0 or \
+            ints[StarField.INT_FIELDS.index('state')].max() > STATE_FADING_OUT or \
+            ints[StarField.INT_FIELDS.index('color')].max() >= len(CALMING_COLORS):
+        return None, "invalid star state"
+    stars._allocate(count)
+    stars.floats[:] = floats
+    stars.ints[:] = ints
+    return time_ms, None
+
+# Session logs: a header (magic, version, JSON with the seed, worker layout, config and control names) followed by
+# one record per frame holding the elapsed ms, mouse position, key presses, touch points and whichever controls changed
+SESSION_MAGIC = b'CSRL'
+SESSION_VERSION = 2
+SESSION_HEADER = struct.Struct('<4sHI')
+SESSION_FRAME = struct.Struct('<HhhBBB')
+SESSION_FRAME_V1 = struct.Struct('<HhhBB')  # version 1 logs have no touch points
+SESSION_TOUCH = struct.Struct('<ff')
+SESSION_CONTROL = struct.Struct('<Bd')
+# Controls recorded besides the menu sliders: everything else that feeds the simulation and isn't derived from keys
+SESSION_STATE = ['resolution', 'screen_width', 'screen_height', 'particle_scale', 'alpha_levels', 'sim_scale', 'power_state']
+
+def session_controls(menu, screen, governor, power):
+    controls = {name: slider.get_value() for name, slider in menu.sliders.items()}
+    controls.update(resolution=menu.resolution_dropdown.selected, screen_width=screen.get_width(), screen_height=screen.get_height(),
+                    particle_scale=governor.particle_scale, alpha_levels=governor.alpha_levels, sim_scale=governor.sim_scale,
+                    power_state=POWER_STATES.index(power.state))
+    return controls
+
+def apply_session_controls(controls, menu, governor, power):
+    # Returns the recorded screen size
+    for name, slider in menu.sliders.items():
+        # Logs recorded before a slider existed leave it at its configured value
+        if name in controls:
+            slider.value = controls[name]
+    menu.resolution_dropdown.selected = int(controls['resolution'])
+    governor.particle_scale = controls['particle_scale']
+    governor.alpha_levels = int(controls['alpha_levels'])
+    governor.sim_scale = controls['sim_scale']
+    power.state = POWER_STATES[int(controls['power_state'])]
+    return int(controls['screen_width']), int(controls['screen_height'])
+
+# SessionRecorder class - writes each frame's inputs so --replay can re-run the session exactly
+class SessionRecorder:
+    def __init__(self, path, header):
+        self.file = open(path, 'wb')
+        self.names = header['controls']
+        data = json.dumps(header).encode()
+        self.file.write(SESSION_HEADER.pack(SESSION_MAGIC, SESSION_VERSION, len(data)))
+        self.file.write(data)
+        self.controls = [None] * len(self.names)
+        self.frames = 0
+
+    def record(self, frame_ms, mouse, keys, touches, controls):
+        values = [controls[name] for name in self.names]
+        changed = [(i, value) for i, value in enumerate(values) if value != self.controls[i]]
+        self.controls = values
+        keys = keys[:255]
+        touches = touches[:255]
+        self.file.write(SESSION_FRAME.pack(min(frame_ms, 65535), mouse[0], mouse[1], len(keys), len(touches), len(changed)))
+        if keys:
+            self.file.write(struct.pack(f'<{len(keys)}i', *keys))
+        for touch in touches:
+            self.file.write(SESSION_TOUCH.pack(*touch))
+        for i, value in changed:
+            self.file.write(SESSION_CONTROL.pack(i, value))
+        self.frames += 1
+
+    def close(self):
+        self.file.close()
+
+# SessionReplay class - reads a session log back one frame at a time
+class SessionReplay:
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self.data = f.read()
+        magic, version, length = SESSION_HEADER.unpack_from(self.data)
+        if magic != SESSION_MAGIC or not 1 <= version <= SESSION_VERSION:
+            raise ValueError(f"{path} is not a version 1-{SESSION_VERSION} session log")
+        self.version = version
+        self.offset = SESSION_HEADER.size + length
+        self.header = json.loads(self.data[SESSION_HEADER.size:self.offset])
+        self.names = self.header['controls']
+        self.controls = {}
+        self.frames = 0
+
+    def next_frame(self):
+        # Returns (frame_ms, mouse, keys, touches, controls) with the full control state, or None at the end of the log
+        if self.offset >= len(self.data):
+            return None
+        if self.version >= 2:
+            frame_ms, mouse_x, mouse_y, key_count, touch_count, changed = SESSION_FRAME.unpack_from(self.data, self.offset)
+            self.offset += SESSION_FRAME.size
+        else:
+            frame_ms, mouse_x, mouse_y, key_count, changed = SESSION_FRAME_V1.unpack_from(self.data, self.offset)
+            self.offset += SESSION_FRAME_V1.size
+            touch_count = 0
+        keys = list(struct.unpack_from(f'<{key_count}i', self.data, self.offset))
+        self.offset += 4 * key_count
+        touches = []
+        for _ in range(touch_count):
+            touches.append(SESSION_TOUCH.unpack_from(self.data, self.offset))
+            self.offset += SESSION_TOUCH.size
+        for _ in range(changed):
+            i, value = SESSION_CONTROL.unpack_from(self.data, self.offset)
+            self.offset += SESSION_CONTROL.size
+            self.controls[self.names[i]] = value
+        self.frames += 1
+        return frame_ms, (mouse_x, mouse_y), keys, touches, self.controls
+
+# StartupTrace class - wall time of each init phase up to the first presented frame (--startup-profile).
+# Work deferred past the first frame (e.g. building the menu) is reported as it happens.
+class StartupTrace:
+    def __init__(self, enabled):
+        self.enabled = enabled
+        self.last = STARTUP_START
+        self.phases = []
+
+    def mark(self, phase):
+        now = time.perf_counter()
+        self.phases.append((phase, (now - self.last) * 1000))
+        self.last = now
+
+    def report(self):
+        if not self.enabled:
+            return
+        for phase, ms in self.phases:
+            print(f"startup: {phase:<14} {ms:8.1f} ms")
+        print(f"startup: {'first frame at':<14} {(self.last - STARTUP_START) * 1000:8.1f} ms")
+
+    def deferred(self, phase, started):
+        if self.enabled:
+            print(f"startup: {phase:<14} {(time.perf_counter() - started) * 1000:8.1f} ms (deferred)")
+
+# Command line options
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Calming Starfield")
+    parser.add_argument('--profile-csv', help="record per-frame profiler samples to this CSV file on exit")
+    parser.add_argument('--profile-rows', type=int, default=3600, help="number of most recent frames kept for --profile-csv")
+    parser.add_argument('--workers', type=int, default=0, help="simulation worker processes (0 or 1 = single process)")
+    parser.add_argument('--chunk-size', type=int, default=8192, help="stars per chunk handed to a worker")
+    parser.add_argument('--seed', type=int, help="seed the simulation for reproducible runs")
+    parser.add_argument('--record', help="write this session's inputs to a log that --replay can re-run")
+    parser.add_argument('--replay', help="re-run a recorded session headlessly and as fast as possible")
+    parser.add_argument('--startup-profile', action='store_true', help="print how long each startup phase took")
+    parser.add_argument('--fresh', action='store_true', help=f"spawn a new starfield instead of resuming {SNAPSHOT_PATH}")
+    parser.add_argument('--metrics-port', type=int, help="serve Prometheus metrics on this localhost port")
+    parser.add_argument('--metrics-socket', help="serve Prometheus metrics on this Unix socket instead")
+    return parser.parse_args(argv)
 
 # Main function
-def main():
-    load_config()
-    global FPS, ATTRACTION_STRENGTH, REPULSION_THRESHOLD, REPULSION_STRENGTH, FADE_DURATION, NUM_PARTICLES, PARTICLE_SIZE, PULSE_AMPLITUDE, PULSE_SPEED, sliders
-    pygame.init()
-    screen = pygame.display.set_mode((WIDTH, HEIGHT))
+def main(argv=None):
+    args = parse_args(argv)
+    trace = StartupTrace(args.startup_profile)
+    trace.mark('imports')
+    file_config = load_config()
+    replay = None
+    if args.replay:
+        # Replays run headless with the settings, seed and worker layout of the recorded session
+        replay = SessionReplay(args.replay)
+        apply_config(replay.header['config'])
+        args.seed, args.workers, args.chunk_size = replay.header['seed'], replay.header['workers'], replay.header['chunk_size']
+        os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    elif args.record and args.seed is None:
+        args.seed = int(np.random.SeedSequence().entropy)
+    global FPS, ATTRACTION_STRENGTH, REPULSION_THRESHOLD, REPULSION_STRENGTH, FADE_DURATION, NUM_PARTICLES, PARTICLE_SIZE, PULSE_AMPLITUDE, PULSE_SPEED, DIRTY_RECTS, RENDER_SCALE, TRAILS, TRAIL_DECAY, PARALLAX, sliders
+    global GOVERNOR_ENABLED, GOVERNOR_PARTICLE_SCALE, GOVERNOR_ALPHA_LEVELS, GOVERNOR_SIM_SCALE, GRAVITY_WELLS_ENABLED
+    trace.mark('config')
+    # Only the modules the app uses; pygame.init() would also bring up audio and joysticks
+    pygame.display.init()
+    pygame.font.init()
+    trace.mark('pygame init')
+
+    # The resolution dropdown falls back to its first entry for sizes it doesn't list, so open the window
+    # at that size straight away rather than switching on the first frame
+    res_index = resolution_index(WIDTH, HEIGHT)
+    current_width, current_height = (int(v) for v in resolutions[res_index].split('x'))
+    screen = pygame.display.set_mode((current_width, current_height))
     pygame.display.set_caption("Calming Starfield")
     clock = pygame.time.Clock()
-    font = pygame.font.SysFont(None, 24)
+    trace.mark('display')
+    # Default font directly; SysFont(None) ends up with the same font after scanning the system font list
+    font = pygame.font.Font(None, 24)
+    trace.mark('font')
     startup = True
+    splash = None
 
-    # Load background
-    try:
-        background = pygame.image.load('background.png')
-        background = pygame.transform.scale(background, (WIDTH, HEIGHT))
-    except:
-        background = create_gradient_background(WIDTH, HEIGHT)
+    # Backgrounds are decoded and scaled on a loader thread, starting after the first frame
+    backgrounds = BackgroundManager()
 
-    # Menu state
+    # Menu state; the menu itself is built the first time it is needed, until then the globals hold the settings
     in_menu = False
     is_fullscreen = False
-    current_width = WIDTH
-    current_height = HEIGHT
-    initial_res_index = 0
-    for i, res in enumerate(resolutions):
-        w, h = res.split('x')
-        if int(w) == WIDTH and int(h) == HEIGHT:
-            initial_res_index = i
-            break
-    menu = OptionsMenu(resolutions, initial_res_index, FPS, NUM_PARTICLES, FADE_DURATION, ATTRACTION_STRENGTH, REPULSION_THRESHOLD, REPULSION_STRENGTH, PARTICLE_SIZE, PULSE_AMPLITUDE, PULSE_SPEED)
+    menu = None
+    # Reduced-size render target used while RENDER_SCALE < 1
+    scaled_scene = None
 
-    # Initialize menu position variables
-    bg_x = 0
-    bg_y = 0
+    def build_menu():
+        nonlocal menu
+        started = time.perf_counter()
+        initial_scale_index = min(range(len(RENDER_SCALES)), key=lambda i: abs(RENDER_SCALES[i] - RENDER_SCALE))
+        menu = OptionsMenu(resolutions, res_index, FPS, NUM_PARTICLES, FADE_DURATION, ATTRACTION_STRENGTH, REPULSION_THRESHOLD, REPULSION_STRENGTH, PARTICLE_SIZE, PULSE_AMPLITUDE, PULSE_SPEED, TRAIL_DECAY, initial_scale_index)
+        update_menu_position()
+        trace.deferred('menu', started)
+
+    def apply_config_changes(changed):
+        # Only the changed settings are touched: physics values are read from the globals (or the menu) every
+        # frame, the particle count is adjusted by StarField.resize and the window only changes with the resolution
+        nonlocal res_index
+        apply_config({**current_config(), **changed})
+        if menu is not None:
+            # The menu's widgets override the globals every frame
+            for key in changed.keys() & menu.sliders.keys():
+                menu.sliders[key].value = changed[key]
+            if 'render_scale' in changed:
+                menu.render_scale_dropdown.selected = RENDER_SCALES.index(RENDER_SCALE)
+        if 'width' in changed or 'height' in changed:
+            res_index = resolution_index(WIDTH, HEIGHT)
+            if menu is not None:
+                menu.resolution_dropdown.selected = res_index
+        if 'governor' in changed:
+            governor.set_enabled(GOVERNOR_ENABLED)
+        # The saved levels only mean something while the governor is running; off, it stays at full quality
+        if governor.enabled:
+            if 'governor_particle_scale' in changed:
+                governor.particle_scale = GOVERNOR_PARTICLE_SCALE
+            if 'governor_alpha_levels' in changed:
+                governor.alpha_levels = GOVERNOR_ALPHA_LEVELS
+            if 'governor_sim_scale' in changed:
+                governor.sim_scale = GOVERNOR_SIM_SCALE
+        if 'gravity_wells' in changed:
+            attractors.wells = [GravityWell(**well) for well in GRAVITY_WELLS]
+        attractors.wells_enabled = GRAVITY_WELLS_ENABLED
+        power.idle_timeout, power.ambient_fps, power.ambient_sim_rate = IDLE_TIMEOUT, AMBIENT_FPS, AMBIENT_SIM_RATE
+        if 'trails' in changed:
+            trails.reset()
+        print(f"Reloaded config.json: {', '.join(sorted(changed))}", file=sys.stderr)
 
     def update_menu_position():
-        nonlocal bg_x, bg_y
-        menu_width = menu.get_width()
-        menu_height = menu.get_height()
-        bg_x = (screen.get_width() - menu_width) // 2
-        bg_y = (screen.get_height() - menu_height) // 2
+        if menu is not None:
+            menu.set_origin((screen.get_width() - menu.width) // 2, (screen.get_height() - menu.height) // 2)
 
-    # Calculate initial menu position (centered)
-    update_menu_position()
+    if args.record or args.replay:
+        # Session logs carry the menu controls from the first frame
+        build_menu()
 
-    stars = []
-    for _ in range(NUM_PARTICLES):
-        star = Star(0, 0, PARTICLE_SIZE, 0.1)
-        star.respawn(WIDTH, HEIGHT)
-        stars.append(star)
+    # Unseeded runs carry on from the last run's stars; seeded, recorded and replayed runs always start fresh
+    resume = args.seed is None and not (args.replay or args.fresh)
+    stars = StarField(0 if resume else NUM_PARTICLES, WIDTH, HEIGHT, seed=args.seed)
+    resumed_ms = None
+    if resume:
+        resumed_ms, reason = restore_snapshot(SNAPSHOT_PATH, stars, screen.get_size())
+        if reason:
+            if reason != "no snapshot":
+                print(f"Not resuming {SNAPSHOT_PATH}: {reason}")
+            stars.resize(NUM_PARTICLES, WIDTH, HEIGHT)
+    trace.mark('stars')
+    simulation = stars
+    if args.workers > 1:
+        simulation = ParallelSimulation(stars, args.workers, args.chunk_size, args.seed)
+    sprites = SpriteCache()
+    renderer = StarRenderer(sprites)
+    trails = TrailRenderer()
+    layers = ParallaxLayers(sprites, seed=args.seed)
+    dirty = DirtyRectRenderer()
+    power = PowerScheduler(IDLE_TIMEOUT, AMBIENT_FPS, AMBIENT_SIM_RATE)
+    governor = QualityGovernor(GOVERNOR_ENABLED, GOVERNOR_PARTICLE_SCALE, GOVERNOR_ALPHA_LEVELS, GOVERNOR_SIM_SCALE)
+    attractors = AttractorSet(GRAVITY_WELLS)
+    attractors.wells_enabled = GRAVITY_WELLS_ENABLED
+    sim_clock = SimClock(SIM_RATE)
+    if resumed_ms is not None:
+        # Carry on the pulse phase of the restored stars
+        sim_clock.time_ms = resumed_ms
+    metrics = None
+    if args.metrics_port is not None or args.metrics_socket:
+        metrics = MetricsExporter(args.metrics_port, args.metrics_socket)
+        print(f"Serving metrics on {metrics.address}")
+    profiler = FrameProfiler(csv_path=args.profile_csv, csv_rows=args.profile_rows, collect=metrics is not None)
+    # Config edits are picked up while running, except in sessions that must match their log
+    watcher = None if args.record or args.replay else ConfigWatcher(file_config)
+    trace.mark('subsystems')
+    recorder = None
+    if args.record:
+        recorder = SessionRecorder(args.record, {'seed': args.seed, 'workers': args.workers, 'chunk_size': args.chunk_size,
+                                                 'config': current_config(), 'controls': list(menu.sliders) + SESSION_STATE})
+    replay_start = time.perf_counter()
 
+    first_frame = True
     running = True
     while running:
-        current_fps = int(menu.sliders['fps'].get_value())
-        clock.tick(current_fps)
+        current_fps = int(menu.sliders['fps'].get_value()) if menu is not None else int(FPS)
+        if replay:
+            frame = replay.next_frame()
+            if frame is None:
+                break
+            frame_ms, replay_mouse, keys, touches, controls = frame
+            events = [pygame.event.Event(pygame.KEYDOWN, key=key) for key in keys]
+            attractors.fingers = dict(enumerate(touches))
+            pygame.event.pump()
+        else:
+            frame_ms, events = power.wait(clock, current_fps)
+        profiler.begin_frame()
 
-        for event in pygame.event.get():
+        for event in events:
+            attractors.handle_event(event)
             if event.type == pygame.QUIT:
                 running = False
             elif event.type == pygame.KEYDOWN:
                 if startup:
                     startup = False
                 if event.key == pygame.K_o:
+                    if menu is None:
+                        build_menu()
                     in_menu = not in_menu
                 elif event.key == pygame.K_r:
                     revert_to_defaults(menu)
+                    governor.set_enabled(GOVERNOR_ENABLED)
+                    attractors.wells_enabled = GRAVITY_WELLS_ENABLED
+                elif event.key == pygame.K_g:
+                    governor.set_enabled(not governor.enabled)
+                elif event.key == pygame.K_w:
+                    attractors.wells_enabled = GRAVITY_WELLS_ENABLED = not attractors.wells_enabled
+                elif event.key == pygame.K_t:
+                    TRAILS = not TRAILS
+                    trails.reset()
+                elif event.key == pygame.K_l:
+                    PARALLAX = not PARALLAX
+                elif event.key == pygame.K_b:
+                    renderer.cycle_mode()
+                elif event.key == pygame.K_p:
+                    profiler.toggle()
+                elif event.key == pygame.K_f:
+                    stars.flocking = not stars.flocking
+                elif event.key == pygame.K_d:
+                    DIRTY_RECTS = not DIRTY_RECTS
                 elif event.key == pygame.K_ESCAPE:
                     if is_fullscreen:
                         is_fullscreen = False
                         screen = pygame.display.set_mode((current_width, current_height))
-                        # Reload background
-                        try:
-                            background = pygame.image.load('background.png')
-                            background = pygame.transform.scale(background, (current_width, current_height))
-                        except:
-                            background = create_gradient_background(current_width, current_height)
                         # Update menu position for new screen size
                         update_menu_position()
                     else:
                         running = False
             if in_menu:
-                if menu.handle_event(event, bg_x, bg_y):
+                profiler.mark(PHASE_EVENTS)
+                toggle_fullscreen = menu.handle_event(event)
+                profiler.mark(PHASE_MENU)
+                if toggle_fullscreen:
                     is_fullscreen = not is_fullscreen
                     if is_fullscreen:
                         screen = pygame.display.set_mode((0, 0), pygame.FULLSCREEN | pygame.NOFRAME)
                     else:
                         screen = pygame.display.set_mode((current_width, current_height))
-                        # Reload background
-                        try:
-                            background = pygame.image.load('background.png')
-                            background = pygame.transform.scale(background, (current_width, current_height))
-                        except:
-                            background = create_gradient_background(current_width, current_height)
                     # Update menu position for new screen size
                     update_menu_position()
+        # After the events, so the key that dismisses the splash already counts towards this frame's state
+        power.observe(events, startup)
+
+        profiler.mark(PHASE_EVENTS)
+        if watcher:
+            changed, errors = watcher.poll()
+            for message in errors:
+                print(f"config.json: {message}", file=sys.stderr)
+            if changed:
+                apply_config_changes(changed)
+        if replay:
+            replay_size = apply_session_controls(controls, menu, governor, power)
 
         # Update settings from sliders and dropdown
-        FPS = int(menu.sliders['fps'].get_value())
-        new_width, new_height = menu.resolution_dropdown.get_value()
-        ATTRACTION_STRENGTH = menu.sliders['attraction_strength'].get_value()
-        REPULSION_THRESHOLD = menu.sliders['repulsion_threshold'].get_value()
-        REPULSION_STRENGTH = menu.sliders['repulsion_strength'].get_value()
-        FADE_DURATION = menu.sliders['fade_duration'].get_value()
-        target_particles = int(menu.sliders['num_particles'].get_value())
-        PARTICLE_SIZE = int(menu.sliders['particle_size'].get_value())
-        PULSE_AMPLITUDE = menu.sliders['pulse_amplitude'].get_value()
-        PULSE_SPEED = menu.sliders['pulse_speed'].get_value()
+        if menu is not None:
+            FPS = int(menu.sliders['fps'].get_value())
+            new_width, new_height = menu.resolution_dropdown.get_value()
+            ATTRACTION_STRENGTH = menu.sliders['attraction_strength'].get_value()
+            REPULSION_THRESHOLD = menu.sliders['repulsion_threshold'].get_value()
+            REPULSION_STRENGTH = menu.sliders['repulsion_strength'].get_value()
+            FADE_DURATION = menu.sliders['fade_duration'].get_value()
+            target_particles = int(menu.sliders['num_particles'].get_value())
+            PARTICLE_SIZE = int(menu.sliders['particle_size'].get_value())
+            PULSE_AMPLITUDE = menu.sliders['pulse_amplitude'].get_value()
+            PULSE_SPEED = menu.sliders['pulse_speed'].get_value()
+            TRAIL_DECAY = menu.sliders['trail_decay'].get_value()
+            RENDER_SCALE = RENDER_SCALES[menu.render_scale_dropdown.selected]
+        else:
+            new_width, new_height = (int(v) for v in resolutions[res_index].split('x'))
+            target_particles = int(NUM_PARTICLES)
 
         # Update window size if changed
         if new_width != current_width or new_height != current_height:
@@ -551,69 +2438,148 @@ def main():
             current_height = new_height
             if not is_fullscreen:
                 screen = pygame.display.set_mode((current_width, current_height))
-                # Reload background
-                try:
-                    background = pygame.image.load('background.png')
-                    background = pygame.transform.scale(background, (current_width, current_height))
-                except:
-                    background = create_gradient_background(current_width, current_height)
             # Update menu position for new screen size
             update_menu_position()
+        if replay and screen.get_size() != replay_size:
+            # Recorded fullscreen sessions replay in a window of the same size
+            screen = pygame.display.set_mode(replay_size)
+            update_menu_position()
 
         # Adjust particle count
-        if len(stars) < target_particles:
-            for _ in range(target_particles - len(stars)):
-                star = Star(0, 0, PARTICLE_SIZE, 0.1)
-                star.respawn(screen.get_width(), screen.get_height())
-                stars.append(star)
-        elif len(stars) > target_particles:
-            stars = stars[:target_particles]
+        # Apply the governor's quality levels on top of the configured values
+        GOVERNOR_ENABLED = governor.enabled
+        GOVERNOR_PARTICLE_SCALE = governor.particle_scale
+        GOVERNOR_ALPHA_LEVELS = governor.alpha_levels
+        GOVERNOR_SIM_SCALE = governor.sim_scale
+        if menu is not None:
+            menu.status_text = governor.status()
+        active_particles = max(1, int(target_particles * governor.particle_scale))
+        stars.resize(active_particles, screen.get_width(), screen.get_height())
+        if PARALLAX:
+            layers.resize(active_particles, screen.get_width(), screen.get_height())
+        sprites.configure(PARTICLE_SIZE, PULSE_AMPLITUDE)
+        sprites.set_alpha_levels(governor.alpha_levels)
 
-        mouse_x, mouse_y = pygame.mouse.get_pos()
+        mouse_x, mouse_y = replay_mouse if replay else pygame.mouse.get_pos()
+        if recorder:
+            recorder.record(frame_ms, (mouse_x, mouse_y), [event.key for event in events if event.type == pygame.KEYDOWN],
+                            attractors.touches(), session_controls(menu, screen, governor, power))
+        profiler.mark(PHASE_MENU)
 
+        hidden = power.state == 'hidden'
         if startup:
-            screen.fill((0, 0, 0))
-            screen_width = screen.get_width()
-            screen_height = screen.get_height()
-            title = font.render("Welcome to Calming Starfield", True, (255, 255, 255))
-            screen.blit(title, (screen_width // 2 - title.get_width() // 2, screen_height // 2 - 120))
-            author = font.render("Created by ShadowlineEU using Kilo Code", True, (200, 200, 200))
-            screen.blit(author, (screen_width // 2 - author.get_width() // 2, screen_height // 2 - 80))
-            options = font.render("Press 'O' to open Options Menu", True, (200, 200, 200))
-            screen.blit(options, (screen_width // 2 - options.get_width() // 2, screen_height // 2 - 40))
-            bg_info = font.render("Customize background.png to change the theme", True, (200, 200, 200))
-            screen.blit(bg_info, (screen_width // 2 - bg_info.get_width() // 2, screen_height // 2))
-            start = font.render("Press any key to start", True, (200, 200, 200))
-            screen.blit(start, (screen_width // 2 - start.get_width() // 2, screen_height // 2 + 40))
-        else:
-            screen.blit(background, (0, 0))
+            # The splash text is rendered once per window size
+            if splash is None or splash.get_size() != screen.get_size():
+                splash = pygame.Surface(screen.get_size()).convert()
+                screen_width = screen.get_width()
+                screen_height = screen.get_height()
+                title = font.render("Welcome to Calming Starfield", True, (255, 255, 255))
+                splash.blit(title, (screen_width // 2 - title.get_width() // 2, screen_height // 2 - 120))
+                author = font.render("Created by ShadowlineEU using Kilo Code", True, (200, 200, 200))
+                splash.blit(author, (screen_width // 2 - author.get_width() // 2, screen_height // 2 - 80))
+                options = font.render("Press 'O' to open Options Menu", True, (200, 200, 200))
+                splash.blit(options, (screen_width // 2 - options.get_width() // 2, screen_height // 2 - 40))
+                bg_info = font.render("Customize background.png to change the theme", True, (200, 200, 200))
+                splash.blit(bg_info, (screen_width // 2 - bg_info.get_width() // 2, screen_height // 2))
+                start = font.render("Press any key to start", True, (200, 200, 200))
+                splash.blit(start, (screen_width // 2 - start.get_width() // 2, screen_height // 2 + 40))
+            screen.blit(splash, (0, 0))
+            dirty_rects = None
+            profiler.mark(PHASE_DRAW)
+        elif not hidden:
+            # Nothing is simulated or drawn while the window is hidden
+            if not in_menu:
+                sim_clock.set_rate(power.sim_rate(SIM_RATE * governor.sim_scale))
+                width, height = screen.get_size()
+                steps = sim_clock.advance(frame_ms)
+                for _ in range(steps):
+                    time_ms = sim_clock.step()
+                    simulation.update(attractors.sources((mouse_x, mouse_y), width, height, time_ms), width, height, time_ms, sim_clock.dt)
+                if PARALLAX:
+                    layers.update(steps * sim_clock.dt, attractors.sources((mouse_x, mouse_y), width, height, sim_clock.time_ms),
+                                  width, height, sim_clock.time_ms)
+                profiler.mark(PHASE_UPDATE)
+
+            # Below 100% render scale the stars are rasterized into a smaller surface that is scaled up once;
+            # the menu and overlay are always drawn at native resolution
+            # Backgrounds for a new size load on a thread; a stand-in is drawn until they are ready
+            background = backgrounds.request(screen.get_size())
+            scene, scene_background = screen, background
+            if RENDER_SCALE < 1 and not in_menu:
+                scaled_size = (max(1, int(screen.get_width() * RENDER_SCALE)), max(1, int(screen.get_height() * RENDER_SCALE)))
+                if scaled_scene is None or scaled_scene.get_size() != scaled_size:
+                    scaled_scene = pygame.Surface(scaled_size).convert()
+                scene, scene_background = scaled_scene, backgrounds.request(scaled_size)
+
+            # Background: whole frame, or only the areas stars/menu touch in dirty-rect mode
+            # Trails and parallax layers cover the whole frame, so they always take the full-frame path
+            dirty.enabled = DIRTY_RECTS and scene is screen and not TRAILS and not PARALLAX
+            dirty_rects = dirty.restore(scene, scene_background, None if in_menu else stars, sim_clock.blend,
+                                        [menu.get_rect()] if in_menu else (), (in_menu, is_fullscreen, id(background), profiler.enabled), profiler.enabled)
+            profiler.mark(PHASE_BACKGROUND)
 
             if in_menu:
                 # Update menu alpha for fade
                 menu.update_alpha(200)
 
-                # Draw menu background
-                current_menu_width = menu.get_width()
-                current_menu_height = menu.get_height()
-                menu_bg = pygame.Surface((current_menu_width, current_menu_height))
-                menu_bg.set_alpha(menu.alpha)
-                menu_bg.fill((0, 0, 0))
-                screen.blit(menu_bg, (bg_x, bg_y))
-
-                # Draw menu
-                menu.draw(screen, font, bg_x, bg_y)
+                # Draw menu (cached background and widget layer)
+                menu.draw(screen, font)
+                profiler.mark(PHASE_MENU)
             else:
                 # Fade out
-                menu.update_alpha(0)
-                for star in stars:
-                    star.update(mouse_x, mouse_y, screen.get_width(), screen.get_height())
-                    star.draw(screen)
+                if menu is not None:
+                    menu.update_alpha(0)
+                if PARALLAX:
+                    layers.draw(scene, (mouse_x, mouse_y), screen.get_size(), scene.get_width() / screen.get_width())
+                if TRAILS:
+                    trails.draw(scene, stars, renderer, sim_clock.blend, scene.get_width() / screen.get_width(), TRAIL_DECAY, frame_ms)
+                else:
+                    renderer.draw(scene, stars, sim_clock.blend, scene.get_width() / screen.get_width())
+                if scene is not screen:
+                    upscale = pygame.transform.smoothscale if RENDER_SCALE_SMOOTH else pygame.transform.scale
+                    upscale(scene, screen.get_size(), screen)
+                profiler.mark(PHASE_DRAW)
 
-        pygame.display.flip()
+        if not hidden:
+            if profiler.enabled:
+                profiler.draw(screen, font, current_fps, clock.get_fps(), len(stars), sprites.stats(), power)
+                profiler.mark(PHASE_OVERLAY)
+            dirty.present(dirty_rects)
+        profiler.mark(PHASE_FLIP)
+        if first_frame:
+            first_frame = False
+            trace.mark('first frame')
+            trace.report()
+            # Start decoding the background while the splash is up
+            backgrounds.request(screen.get_size())
+        if power.state == 'active' and not in_menu and not replay:
+            governor.update(clock.get_rawtime(), current_fps, renderer.sprite_share)
+        profiler.end_frame(frame_ms, current_fps, clock.get_fps(), len(stars))
+        if metrics:
+            metrics.observe(frame_ms, current_fps, clock.get_fps(), len(stars), profiler.phases, screen.get_size(), is_fullscreen,
+                            RENDER_SCALE, power.state)
 
-    save_config()
+    if replay:
+        elapsed = time.perf_counter() - replay_start
+        print(f"Replayed {replay.frames} frames in {elapsed:.2f}s ({elapsed * 1000 / max(1, replay.frames):.2f} ms/frame), state digest {stars.digest()}")
+    else:
+        save_config()
+        # Seeded and recorded runs are reproducible sessions; they must not leave their stars for the next start
+        if args.seed is None:
+            save_snapshot(SNAPSHOT_PATH, stars, screen.get_size(), sim_clock.time_ms)
+        print(power.report())
+    if recorder:
+        recorder.close()
+        print(f"Recorded {recorder.frames} frames to {args.record}, state digest {stars.digest()}")
+    profiler.write_csv()
+    if metrics:
+        metrics.close()
+    if watcher:
+        watcher.close()
+    if simulation is not stars:
+        simulation.close()
     pygame.quit()
     sys.exit()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
\ No newline at end of file
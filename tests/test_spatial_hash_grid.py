@@ -0,0 +1,24 @@
+import os
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+import main as starfield
+
+
+# A star pushed just past the left edge in the top cell row, before the step's wrap pulls it back,
+# used to land in a cell whose top-left neighbour indexed the cell table at -1
+def test_neighbor_forces_with_star_left_of_screen():
+    stars = starfield.StarField(1, 800, 600, seed=0)
+    stars.x[0], stars.y[0] = -0.3, 10
+    stars.alpha[0] = 255
+    stars.apply_neighbor_forces(1.0)
+    assert stars.neighbor_pairs == 0
+
+
+def test_pairs_for_stars_outside_screen():
+    grid = starfield.SpatialHashGrid(50)
+    x = starfield.np.array([-0.3, 5.0, 820.0, -60.0])
+    y = starfield.np.array([10.0, 12.0, -4.0, 700.0])
+    grid.rebuild(x, y, 50)
+    first, second = grid.pairs(starfield.np.arange(len(x)))
+    assert {(0, 1), (1, 0)} <= set(zip(first.tolist(), second.tolist()))